@@ -1,17 +1,77 @@
 # api_config.py
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, make_response, abort, g, has_request_context
+import io
+import os
+import csv
+import zlib
 import time
+import bisect
+import datetime
+import queue
+import hmac
+import base64
 import hashlib
 import json
 import sqlite3
+import pathlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import wraps
 
+from data_ingestion.process_data_to_silver import COMPACT_SALES_SQL, SALE_DAY_EPOCH, SALE_DAY_PARAM
+
 app = Flask(__name__)
 
 DB_PATH = "database.db"
 API_RATE_LIMIT = 100  # Requests per minute
+API_RATE_WINDOW = 60.0  # Seconds the rate limits are counted over
+API_ROUTE_RATE_LIMITS = {'export_data': 10}  # Per-endpoint limits, counted separately from the default
+API_USER_RATE_LIMITS = {}  # Per-user limits for authenticated (basic auth) clients, e.g. {'admin': 1000}
+RATE_LIMIT_IDLE_TTL = 300.0  # Seconds before an idle client's bucket is dropped
+API_MAX_PAGE_SIZE = 1000
+# Signs pagination cursors; set it to the same value on every API process behind a load balancer
+API_CURSOR_SECRET = os.environ.get('API_CURSOR_SECRET', '').encode() or os.urandom(32)
+
+# Read-only connection pool
+DB_POOL_SIZE = 16  # Idle connections kept open; more are opened under load and closed when returned
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_CACHE_SIZE = -64000  # Negative means KiB, so ~64 MB of page cache per connection
+DB_STATEMENT_CACHE = 256  # Prepared statements cached per connection
+
+_connection_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+# Response cache, invalidated whenever process_data bumps the data version
+API_CACHE_SIZE = 1024  # Cached responses kept, least recently used evicted first
+
+_response_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_state = {'version': None, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+# Optional in-memory columnar copy of sales for the analytics routes, refreshed when the data version moves
+API_COLUMNAR_CACHE = os.environ.get('API_COLUMNAR_CACHE', '') == '1'
+COLUMNAR_FETCH_SIZE = 200000  # Rows per fetchmany while loading sales into arrays
+COLUMNAR_SCAN_SIZE = 1 << 18  # Most rows masked per step while looking for a page of filtered sales
+
+_columnar = {'sales': None, 'refreshing': False}
+_columnar_lock = threading.Lock()  # Guards _columnar; held only to read or swap it
+_columnar_load_lock = threading.Lock()  # One load or refresh at a time
+
+# A database created with process_data --compact-schema stores product_key (into product_keys) and sale_day
+# (days since 1970-01-01) in sales instead of product_id and sale_date; COMPACT_SALES_SQL reads them back as text.
+# Page keys hold sale_date text either way; compared with sale_day, the text is converted in SQL
+PAGE_KEY_PLACEHOLDERS = {'sale_day': SALE_DAY_PARAM}
+
+_schema = {'identity': None, 'compact': False}
+
+# Per-endpoint request metrics served by /metrics
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)  # Histogram upper bounds; slower goes in +Inf
+_endpoint_metrics = {}
+_metrics_lock = threading.Lock()
+
 
-request_counts = {}
 def check_auth(username, password):
     """This function checks if the username / password combinations are valid."""
     return username == 'admin' and password == 'password123' 
@@ -32,169 +92,908 @@ def requires_auth(f):
         return f(*args, **kwargs)
     return decorated
 
-def generate_cursor(last_id, limit):
-    """Generates a cursor for pagination."""
-    return hashlib.md5(f"{last_id}-{limit}".encode()).hexdigest()
+def _cursor_signature(payload, scope):
+    message = f"{scope}:{payload}".encode()
+    return hmac.new(API_CURSOR_SECRET, message, hashlib.sha256).hexdigest()[:32]
+
+def generate_cursor(last_key, scope):
+    """Generates a signed cursor holding the page key of the last row returned by the scope endpoint."""
+    key = json.dumps(list(last_key), separators=(',', ':')).encode()
+    payload = base64.urlsafe_b64encode(key).decode().rstrip('=')
+    return f"{payload}.{_cursor_signature(payload, scope)}"
 
-def validate_cursor(cursor, last_id, limit):
-    """Validates a cursor."""
-    return cursor == generate_cursor(last_id, limit)
+def validate_cursor(cursor, scope):
+    """Validates a cursor issued by the scope endpoint and returns its page key, or None if it was tampered with."""
+    payload, _, signature = cursor.partition('.')
+    if not hmac.compare_digest(signature.encode(), _cursor_signature(payload, scope).encode()):
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except ValueError:
+        return None
+
+class RateLimiter:
+    """Token bucket per client with constant time and memory per request and per client.
+
+    A bucket holds up to limit tokens and refills at limit per window seconds; each request takes one.
+    Buckets are kept in least-recently-seen order, so ones idle for longer than idle_ttl are evicted
+    from the front in amortized O(1). Safe to share between threads.
+    """
+    def __init__(self, window=API_RATE_WINDOW, idle_ttl=RATE_LIMIT_IDLE_TTL, clock=time.monotonic):
+        self.window = window
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last_seen]
+        self._lock = threading.Lock()
+
+    def allow(self, key, limit):
+        """Takes a token from key's bucket, returning False if it is empty."""
+        if limit == float('inf'):
+            return True
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(limit), now]
+            else:
+                bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit / self.window)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+            self._evict_idle(now)
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def _evict_idle(self, now):
+        buckets = self._buckets
+        while buckets:
+            key = next(iter(buckets))
+            if now - buckets[key][1] <= self.idle_ttl:
+                return
+            del buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+rate_limiter = RateLimiter()
 
 def rate_limit():
-    ip_address = request.remote_addr
-    now = time.time()
-    if ip_address not in request_counts:
-        request_counts[ip_address] = []
-    requests = request_counts[ip_address]
-    requests = [r for r in requests if r > now - 60]
-    if len(requests) >= API_RATE_LIMIT:
-        return False
-    requests.append(now)
-    request_counts[ip_address] = requests
-    return True
+    """Applies the per-route, per-user or default limit to the current client (user if authenticated, else IP)."""
+    auth = request.authorization
+    user = auth.username if auth and check_auth(auth.username, auth.password) else None
+    client = f"user:{user}" if user else request.remote_addr
+    limit = API_ROUTE_RATE_LIMITS.get(request.endpoint) or API_USER_RATE_LIMITS.get(user) or API_RATE_LIMIT
+    # Routes with their own limit get their own bucket, so they neither use up nor are used up by the default
+    scope = request.endpoint if request.endpoint in API_ROUTE_RATE_LIMITS else None
+    return rate_limiter.allow((client, scope), limit)
+
+def _db_identity():
+    """Identifies the database file, so connections to a file the pipeline has since replaced can be spotted."""
+    stat = os.stat(DB_PATH)
+    return stat.st_dev, stat.st_ino
+
+def _open_connection():
+    """Opens a tuned read-only connection to DB_PATH."""
+    uri = pathlib.Path(DB_PATH).absolute().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size={DB_CACHE_SIZE}")
+    return conn
+
+def clear_connection_pool():
+    """Closes every idle pooled connection."""
+    while True:
+        try:
+            conn, _ = _connection_pool.get_nowait()
+        except queue.Empty:
+            return
+        conn.close()
+
+@contextmanager
+def pooled_connection():
+    """Checks a read-only connection out of the pool for the duration of the block."""
+    identity = _db_identity()
+    try:
+        conn, conn_identity = _connection_pool.get_nowait()
+        if conn_identity != identity:
+            # The database file was swapped or rewritten; everything idle points at the old one
+            conn.close()
+            clear_connection_pool()
+            conn = _open_connection()
+    except queue.Empty:
+        conn = _open_connection()
+
+    broken = False
+    try:
+        yield conn
+    except sqlite3.DatabaseError:
+        broken = True
+        raise
+    finally:
+        # Also runs when the block is abandoned, e.g. a streamed export whose client disconnected
+        if broken:
+            conn.close()
+        else:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                _connection_pool.put_nowait((conn, identity))
+            except queue.Full:
+                conn.close()
 
 def execute_query(query, params=()):
-    """Executes a database query and returns the result."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
-
-def paginate_query(query, params, limit, cursor_val):
-    """Paginates a query based on limit and cursor."""
-    if cursor_val:
-        cursor_id = cursor_val.split('-')[0]  # Extract the ID from the cursor
-        query += " AND rowid > ?"
-        params.append(cursor_id)
-
-    query += " LIMIT ?"
+    """Executes a database query on a pooled connection and returns the result.
+
+    Inside a request, the query's time is added to the request's SQL time for /metrics.
+    """
+    started = time.perf_counter()
+    try:
+        with pooled_connection() as conn:
+            return conn.execute(query, params).fetchall()
+    except sqlite3.DatabaseError:
+        # A pooled connection can fail if the pipeline rewrote the file in place; retry once on a fresh one
+        clear_connection_pool()
+        with pooled_connection() as conn:
+            return conn.execute(query, params).fetchall()
+    finally:
+        if has_request_context():
+            g.sql_s = g.get('sql_s', 0.0) + time.perf_counter() - started
+            g.queries = g.get('queries', 0) + 1
+
+def compact_schema():
+    """Whether sales has the compact layout; checked once per database file."""
+    identity = _db_identity()
+    if _schema['identity'] != identity:
+        _schema['compact'] = any(row[1] == 'sale_day' for row in execute_query("PRAGMA table_info(sales)"))
+        _schema['identity'] = identity
+    return _schema['compact']
+
+def sales_select(columns):
+    """The SELECT list for the named sales columns, reading product_id and sale_date back from a compact layout."""
+    if not compact_schema():
+        return ', '.join(columns)
+    return ', '.join(f"{COMPACT_SALES_SQL[c]} AS {c}" if c in COMPACT_SALES_SQL else c for c in columns)
+
+def data_version():
+    """Returns the data version stamp that process_data increments after each run that loads data."""
+    return execute_query("PRAGMA user_version")[0][0]
+
+def cached_response(f):
+    """Serves repeated requests for the same endpoint and query string from memory until the data changes."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = (request.endpoint, tuple(sorted(request.args.items(multi=True))))
+        # A database swapped in for another can carry the same user_version, so the file is part of the version
+        version = (_db_identity(), data_version())
+        with _cache_lock:
+            if version != _cache_state['version']:
+                _response_cache.clear()
+                _cache_state['version'] = version
+            cached = _response_cache.get(key)
+            if cached is not None:
+                _response_cache.move_to_end(key)
+                _cache_state['hits'] += 1
+            else:
+                _cache_state['misses'] += 1
+        if cached is not None:
+            return Response(cached, mimetype='application/json')
+
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            with _cache_lock:
+                # Skip storing if a newer load landed while this response was built, or it was answered
+                # from a columnar copy still being refreshed
+                if _cache_state['version'] == version and not g.get('columnar_stale'):
+                    _response_cache[key] = response.get_data()
+                    while len(_response_cache) > API_CACHE_SIZE:
+                        _response_cache.popitem(last=False)
+                        _cache_state['evictions'] += 1
+        return response
+    return decorated
+
+def page_limit():
+    """Reads the limit query parameter, clamped to 1..API_MAX_PAGE_SIZE."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        abort(400, description="limit must be an integer")
+    return min(max(limit, 1), API_MAX_PAGE_SIZE)
+
+def paginate_query(query, params, key_columns, limit, last_key=None):
+    """Adds keyset pagination on key_columns to a query that ends in its WHERE clause.
+
+    Rows are ordered by the key and a page starts strictly after last_key, so with an index on the key
+    every page is a single seek rather than a scan past all earlier rows.
+    """
+    params = list(params)
+    columns = ', '.join(key_columns)
+    if last_key is not None:
+        placeholders = ', '.join(PAGE_KEY_PLACEHOLDERS.get(column, '?') for column in key_columns)
+        query += f" AND ({columns}) > ({placeholders})"
+        params.extend(last_key)
+
+    query += f" ORDER BY {columns} LIMIT ?"
     params.append(limit)
 
     return query, params
 
-def fetch_paginated_data(query, params, limit, cursor_val):
-    """Fetches paginated data and returns the result with a cursor."""
-    query, params = paginate_query(query, params, limit, cursor_val)
+def read_page_key(cursor_val, key_length):
+    """Returns the page key held in the request's cursor (None without one), rejecting invalid cursors."""
+    if not cursor_val:
+        return None
+    last_key = validate_cursor(cursor_val, request.endpoint)
+    if not isinstance(last_key, list) or len(last_key) != key_length:
+        abort(400, description="Invalid cursor")
+    return last_key
+
+def fetch_paginated_data(query, params, key_columns, limit, cursor_val):
+    """Fetches one page and returns it with the cursor for the next page.
+
+    The query must select the key_columns first; they become the next cursor's page key.
+    """
+    last_key = read_page_key(cursor_val, len(key_columns))
+    query, params = paginate_query(query, params, key_columns, limit, last_key)
     rows = execute_query(query, params)
-    next_cursor = None
+    return rows, next_page_cursor(rows, len(key_columns), limit)
 
+def next_page_cursor(rows, key_length, limit):
+    """Returns the cursor for the page after rows (whose first key_length columns are the page key), if any."""
     if len(rows) == limit:
-        last_row_id = rows[-1][0]  # Assuming first column is the row ID
-        next_cursor = f"{last_row_id}-{limit}"
+        return generate_cursor(rows[-1][:key_length], request.endpoint)
+    return None
+
+def _encode(values, index):
+    """Returns int32 codes for values, adding values not in index (value -> code) to it; None is coded as ''."""
+    codes, uniques = pd.factorize(np.array(values, dtype=object))
+    lookup = [index.setdefault(value, len(index)) for value in uniques.tolist()]
+    if (codes < 0).any():
+        lookup.append(index.setdefault('', len(index)))  # Code -1 picks the last entry
+    return np.array(lookup, dtype=np.int32)[codes]
+
+def _sorted_vocabulary(index):
+    """Sorts the values of index (value -> code); returns them with rank, which maps each code to its position."""
+    values = list(index)
+    order = sorted(range(len(values)), key=values.__getitem__)
+    rank = np.empty(len(values), dtype=np.int32)
+    rank[order] = np.arange(len(values), dtype=np.int32)
+    return [values[i] for i in order], rank
+
+def _integer_param(value):
+    """The integer a query parameter matches in an INTEGER column, as SQLite compares them, or None."""
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+class ColumnarSales:
+    """An in-memory copy of the sales columns the analytics routes read, with their aggregates.
 
-    return rows, next_cursor
+    Dates and product ids are held as int32 codes into sorted vocabularies (a NULL date as ''), so codes
+    order like the strings they stand for and the grouped keys sort like the SQL keys. Rows are in sale_id
+    order, with (sale_date, sale_id) and (product_id, sale_id) orderings alongside, as the sales indexes
+    are, for date-ranged and product filters. The daily, product-daily and category aggregates are grouped
+    with NumPy when loading, and a refresh only groups the rows added since the previous load. Instances
+    are never modified, so requests can keep using one while the next is built.
+    """
+    @classmethod
+    def load(cls, previous=None):
+        """Loads sales from the database, reusing previous (an earlier load) for the rows it already holds.
+
+        Everything is reloaded instead if sales were deleted since previous (a file reloaded with --replace)
+        or the database file was replaced.
+        """
+        self = cls()
+        self.identity = _db_identity()
+        with pooled_connection() as conn:
+            conn.execute("BEGIN")  # One snapshot for the version, counts and rows
+            try:
+                self.version = conn.execute("PRAGMA user_version").fetchone()[0]
+                category_names = dict(conn.execute("SELECT category_id, category_name FROM categories"))
+                total = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+                if previous is not None:
+                    added = conn.execute("SELECT COUNT(*) FROM sales WHERE sale_id > ?",
+                                         (previous.last_sale_id,)).fetchone()[0]
+                    if previous.identity != self.identity or previous.rows + added != total:
+                        previous = None
+                new = self._read_rows(conn, previous)
+            finally:
+                conn.commit()
+        self._build(previous, *new)
+        self._build_category_sales(category_names)
+        return self
+
+    def _read_rows(self, conn, previous):
+        """Reads the sales after previous's last sale_id into arrays, coding dates and products."""
+        self.date_index = dict(previous.date_index) if previous else {}
+        self.product_index = dict(previous.product_index) if previous else {}
+        columns = [[] for _ in range(6)]
+        select = sales_select(['sale_id', 'sale_date', 'product_id', 'category_id', 'quantity', 'price'])
+        cursor = conn.execute(f"SELECT {select} FROM sales WHERE sale_id > ? ORDER BY sale_id",
+                              (previous.last_sale_id if previous else 0,))
+        while True:
+            rows = cursor.fetchmany(COLUMNAR_FETCH_SIZE)
+            if not rows:
+                break
+            sale_id, sale_date, product_id, category_id, quantity, price = zip(*rows)
+            columns[0].append(np.array(sale_id, dtype=np.int64))
+            columns[1].append(_encode(sale_date, self.date_index))
+            columns[2].append(_encode(product_id, self.product_index))
+            columns[3].append(np.array([-1 if c is None else c for c in category_id], dtype=np.int32))
+            columns[4].append(np.array([q or 0 for q in quantity], dtype=np.int64))
+            columns[5].append(np.array([p or 0.0 for p in price], dtype=np.float64))
+        dtypes = (np.int64, np.int32, np.int32, np.int32, np.int64, np.float64)
+        return [np.concatenate(chunks) if chunks else np.empty(0, dtype) for chunks, dtype in zip(columns, dtypes)]
+
+    def _build(self, previous, sale_id, date_code, product_code, category_id, quantity, price):
+        """Appends the new rows to previous's, then updates the orderings and aggregates."""
+        self.dates, date_rank = _sorted_vocabulary(self.date_index)
+        self.products, product_rank = _sorted_vocabulary(self.product_index)
+        self.date_index = dict(zip(self.dates, range(len(self.dates))))
+        self.product_index = dict(zip(self.products, range(len(self.products))))
+        date_code, product_code = date_rank[date_code], product_rank[product_code]
+        products = max(len(self.products), 1)
+
+        # Daily counts, category sums and (sale_date, product_id) groups of the new rows
+        daily = np.bincount(date_code, minlength=len(self.dates))
+        valid = category_id >= 0
+        category_total = np.bincount(category_id[valid], weights=(price * quantity)[valid])
+        category_count = np.bincount(category_id[valid])
+        keys, counts = np.unique(date_code.astype(np.int64) * products + product_code, return_counts=True)
+
+        if previous is None:
+            self.sale_id, self.date_code, self.product_code = sale_id, date_code, product_code
+            self.category_id, self.quantity, self.price = category_id, quantity, price
+            self.by_date, self.sorted_dates = _extend_ordering(None, None, None, date_code)
+            self.by_product, self.sorted_products = _extend_ordering(None, None, None, product_code)
+            self.daily = daily
+            self.category_total, self.category_count = category_total, category_count
+            self.group_keys, self.group_counts = keys, counts
+        else:
+            self.by_date, self.sorted_dates = _extend_ordering(previous.by_date, previous.sorted_dates,
+                                                               date_rank, date_code)
+            self.by_product, self.sorted_products = _extend_ordering(previous.by_product, previous.sorted_products,
+                                                                     product_rank, product_code)
+            self.sale_id = np.concatenate([previous.sale_id, sale_id])
+            self.date_code = np.concatenate([date_rank[previous.date_code], date_code])
+            self.product_code = np.concatenate([product_rank[previous.product_code], product_code])
+            self.category_id = np.concatenate([previous.category_id, category_id])
+            self.quantity = np.concatenate([previous.quantity, quantity])
+            self.price = np.concatenate([previous.price, price])
+            self.daily = daily
+            self.daily[date_rank[:len(previous.daily)]] += previous.daily
+            self.category_total = _add_padded(previous.category_total, category_total)
+            self.category_count = _add_padded(previous.category_count, category_count)
+            old_products = max(len(previous.products), 1)
+            old_keys = (date_rank[previous.group_keys // old_products].astype(np.int64) * products
+                        + product_rank[previous.group_keys % old_products])
+            self.group_keys, inverse = np.unique(np.concatenate([old_keys, keys]), return_inverse=True)
+            self.group_counts = np.bincount(inverse, weights=np.concatenate([previous.group_counts, counts]),
+                                            minlength=len(self.group_keys)).astype(np.int64)
+        self.rows = len(self.sale_id)
+        self.last_sale_id = int(self.sale_id[-1]) if self.rows else 0
+        self.daily_codes = np.flatnonzero(self.daily)
+
+    def _build_category_sales(self, category_names):
+        self.category_sales = sorted(
+            (category_names[category_id], float(self.category_total[category_id]), int(count))
+            for category_id, count in enumerate(self.category_count.tolist())
+            if count > 0 and category_names.get(category_id) is not None
+        )
+
+    def daily_counts(self, last_key, limit):
+        """Returns (sale_date, count) rows in sale_date order after last_key, as the daily rollup query does."""
+        start = 0 if last_key is None else bisect.bisect_right(self.dates, last_key[0])
+        codes = self.daily_codes[np.searchsorted(self.daily_codes, start):][:limit]
+        return [(self.dates[code], count) for code, count in zip(codes.tolist(), self.daily[codes].tolist())]
+
+    def product_daily_counts(self, last_key, limit):
+        """Returns (sale_date, product_id, count) rows in key order after last_key."""
+        products = max(len(self.products), 1)
+        bound = 0
+        if last_key is not None:
+            date = bisect.bisect_left(self.dates, last_key[0])
+            bound = date * products
+            if date < len(self.dates) and self.dates[date] == last_key[0]:
+                bound += bisect.bisect_right(self.products, last_key[1])
+        start = np.searchsorted(self.group_keys, bound)
+        keys = self.group_keys[start:start + limit]
+        return [(self.dates[key // products], self.products[key % products], count)
+                for key, count in zip(keys.tolist(), self.group_counts[start:start + limit].tolist())]
+
+    def category_sales_after(self, last_key, limit):
+        """Returns (category_name, total_sales, count) rows in category_name order after last_key."""
+        start = 0 if last_key is None else bisect.bisect_right(self.category_sales, (last_key[0], float('inf')))
+        return self.category_sales[start:start + limit]
+
+    def filtered(self, filters, key_columns, columns, last_key, limit):
+        """Returns the /sales/filtered rows (as tuples of columns) after last_key, with masks over the arrays."""
+        has_date_range = columns[0] == 'sale_date'
+        low, high = 0, len(self.dates)
+        date_prefix = filters.get('date')
+        if date_prefix:
+            low = max(low, bisect.bisect_left(self.dates, date_prefix))
+            high = min(high, bisect.bisect_left(self.dates, date_prefix[:-1] + chr(ord(date_prefix[-1]) + 1)))
+        if filters.get('start_date'):
+            low = max(low, bisect.bisect_left(self.dates, _iso_date('start_date', filters['start_date'])))
+        if filters.get('end_date'):
+            high = min(high, bisect.bisect_right(self.dates, _iso_date('end_date', filters['end_date'])))
+        if has_date_range and self.dates and self.dates[0] == '':
+            low = max(low, 1)  # NULL dates never match a date condition
+        category_id = None
+        if filters.get('category'):
+            category_id = _integer_param(filters['category'])
+            category_id = -2 if category_id is None else category_id  # Matches no row
+        # Codes are compared as int32, the arrays' type; a Python int would have searchsorted convert the array
+        low, high = np.int32(low), np.int32(max(low, high))
+
+        if filters.get('product_id'):
+            rows = self._product_rows(filters['product_id'], has_date_range, low, high, last_key)
+            if category_id is not None:
+                rows = rows[self.category_id[rows] == category_id]
+            rows = rows[:limit]
+        elif has_date_range:
+            begin = np.searchsorted(self.sorted_dates, low)
+            end = np.searchsorted(self.sorted_dates, high)
+            if last_key is not None:
+                date = np.int32(bisect.bisect_left(self.dates, last_key[0]))
+                position = np.searchsorted(self.sorted_dates, date)
+                if date < len(self.dates) and self.dates[date] == last_key[0]:
+                    block_end = np.searchsorted(self.sorted_dates, date, side='right')
+                    position += np.searchsorted(self.sale_id[self.by_date[position:block_end]], last_key[1],
+                                                side='right')
+                begin = max(begin, position)
+            rows = self._scan(lambda start, stop: self.by_date[start:stop], begin, end, category_id, limit)
+        else:
+            begin = 0 if last_key is None else np.searchsorted(self.sale_id, last_key[0], side='right')
+            rows = self._scan(lambda start, stop: np.arange(start, stop), begin, self.rows, category_id, limit)
+
+        values = {
+            'sale_id': self.sale_id[rows].tolist(),
+            'rowid': self.sale_id[rows].tolist(),  # sale_id is an alias of the rowid
+            'product_id': [self.products[code] for code in self.product_code[rows].tolist()],
+            'sale_date': [self.dates[code] or None for code in self.date_code[rows].tolist()],
+            'quantity': self.quantity[rows].tolist(),
+            'price': self.price[rows].tolist(),
+            'category_id': [None if c < 0 else c for c in self.category_id[rows].tolist()],
+        }
+        return list(zip(*(values[column] for column in columns)))
+
+    def _product_rows(self, product_id, has_date_range, low, high, last_key):
+        """Rows of product_id after last_key, in page order, from the (product_id, sale_id) ordering."""
+        code = np.int32(self.product_index.get(product_id, -1))
+        rows = self.by_product[np.searchsorted(self.sorted_products, code):
+                               np.searchsorted(self.sorted_products, code, side='right')]
+        if not has_date_range:
+            if last_key is not None:
+                rows = rows[np.searchsorted(self.sale_id[rows], last_key[0], side='right'):]
+            return rows
+        dates = self.date_code[rows]
+        keep = (dates >= low) & (dates < high)
+        if last_key is not None:
+            date = bisect.bisect_left(self.dates, last_key[0])
+            if date < len(self.dates) and self.dates[date] == last_key[0]:
+                keep &= (dates > date) | ((dates == date) & (self.sale_id[rows] > last_key[1]))
+            else:
+                keep &= dates >= date
+        rows = rows[keep]
+        return rows[np.argsort(self.date_code[rows], kind='stable')]
+
+    def _scan(self, ordered, begin, end, category_id, limit):
+        """The first limit rows of ordered(begin, end) in the category (any, if None), masked a block at a time.
+
+        Blocks start a few pages long and double up to COLUMNAR_SCAN_SIZE, so a common category costs one
+        small block and a rare one few steps.
+        """
+        hits = []
+        found = 0
+        block = max(limit * 8, 1024)
+        while begin < end and found < limit:
+            stop = min(begin + block, end)
+            block = min(block * 2, COLUMNAR_SCAN_SIZE)
+            rows = ordered(begin, stop if category_id is not None else min(stop, begin + limit - found))
+            if category_id is not None:
+                rows = rows[self.category_id[rows] == category_id]
+            hits.append(rows[:limit - found])
+            found += len(hits[-1])
+            begin = stop
+        return np.concatenate(hits) if hits else np.empty(0, np.int64)
+
+def _extend_ordering(order, sorted_codes, rank, codes):
+    """Adds rows with codes to a (code, sale_id) ordering of earlier rows, returning the new (order, sorted_codes).
+
+    order holds row positions and sorted_codes their codes before rank (old code -> new code) renumbered
+    them. The new rows follow every earlier row in sale_id, so within a code they go last.
+    """
+    new_order = np.argsort(codes, kind='stable').astype(np.int32)
+    if order is None:
+        return new_order, codes[new_order]
+    # Ranks only move codes up to make room for new values, so the earlier ordering stays sorted
+    sorted_codes = rank[sorted_codes]
+    positions = np.searchsorted(sorted_codes, codes[new_order], side='right')
+    return (np.insert(order, positions, new_order + len(order)),
+            np.insert(sorted_codes, positions, codes[new_order]))
+
+def _add_padded(a, b):
+    """Adds two bincount results of possibly different lengths."""
+    total = np.zeros(max(len(a), len(b)), dtype=np.result_type(a, b))
+    total[:len(a)] += a
+    total[:len(b)] += b
+    return total
+
+def columnar_sales():
+    """Returns the columnar copy of sales, loading it first if there is none yet.
+
+    If the data version moved, a background thread builds the refreshed copy and requests keep using the
+    current one (and are not cached) until it is swapped in.
+    """
+    version, identity = data_version(), _db_identity()
+    with _columnar_lock:
+        sales = _columnar['sales']
+        if sales is not None and (sales.version != version or sales.identity != identity):
+            if has_request_context():
+                g.columnar_stale = True
+            if not _columnar['refreshing']:
+                _columnar['refreshing'] = True
+                threading.Thread(target=_refresh_columnar, name='columnar-refresh', daemon=True).start()
+    if sales is not None:
+        return sales
+    with _columnar_load_lock:
+        with _columnar_lock:
+            sales = _columnar['sales']
+        if sales is None:
+            # Nothing to serve in the meantime, so this request waits, and others for the same load
+            sales = ColumnarSales.load()
+            with _columnar_lock:
+                _columnar['sales'] = sales
+    return sales
+
+def _refresh_columnar():
+    """Builds the next columnar copy from the current one and swaps it in."""
+    try:
+        with _columnar_load_lock:
+            sales = ColumnarSales.load(_columnar['sales'])
+        with _columnar_lock:
+            _columnar['sales'] = sales
+    finally:
+        with _columnar_lock:
+            _columnar['refreshing'] = False
+
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({"error": error.description}), 400
 
 @app.before_request
 def before_request():
+    g.request_started = time.perf_counter()
     if not rate_limit():
         return jsonify({"error": "Rate limit exceeded"}), 429
 
+@app.after_request
+def record_request_metrics(response):
+    """Adds the request's latency and SQL time to its endpoint's metrics.
+
+    Latency is measured up to the response being returned, so streamed exports count the time to their
+    first byte, not the whole download.
+    """
+    started = g.get('request_started')
+    if started is None:
+        return response
+    latency_ms = (time.perf_counter() - started) * 1000
+    bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+    with _metrics_lock:
+        stats = _endpoint_metrics.setdefault(request.endpoint or 'unmatched', {
+            'requests': 0, 'errors': 0, 'queries': 0, 'latency_ms': 0.0, 'sql_ms': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        })
+        stats['requests'] += 1
+        stats['errors'] += response.status_code >= 400
+        stats['queries'] += g.get('queries', 0)
+        stats['latency_ms'] += latency_ms
+        stats['sql_ms'] += g.get('sql_s', 0.0) * 1000
+        stats['buckets'][bucket] += 1
+    return response
+
+def _histogram_quantile(buckets, q):
+    """Returns the upper bound of the histogram bucket holding quantile q (None if it is the +Inf bucket)."""
+    rank, seen = q * sum(buckets), 0
+    for bound, count in zip(LATENCY_BUCKETS_MS + (None,), buckets):
+        seen += count
+        if seen >= rank:
+            return bound
+    return None
+
 @app.route('/products', methods=['GET'])
+@cached_response
 def get_products():
     """Returns a list of products."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = "SELECT rowid, product_id, product_name, category_id FROM products WHERE 1=1"
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    query = "SELECT product_id, rowid, product_name, category_id FROM products WHERE 1=1"
+    rows, next_cursor = fetch_paginated_data(query, [], ['product_id'], limit, cursor_val)
     return jsonify({
-        'products': [{'rowid': p[0],'product_id': p[1], 'product_name': p[2], 'category': p[3]} for p in rows],
+        'products': [{'rowid': p[1],'product_id': p[0], 'product_name': p[2], 'category': p[3]} for p in rows],
         'next_cursor': next_cursor
     })
 
 @app.route('/sales', methods=['GET'])
+@cached_response
 def get_sales():
     """Returns a list of sales."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = "SELECT rowid, sale_id, product_id, sale_date, quantity, price, category_id FROM sales WHERE 1=1"
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    columns = sales_select(['sale_id', 'rowid', 'product_id', 'sale_date', 'quantity', 'price', 'category_id'])
+    query = f"SELECT {columns} FROM sales WHERE 1=1"
+    rows, next_cursor = fetch_paginated_data(query, [], ['sale_id'], limit, cursor_val)
     return jsonify({
-        'sales': [{'rowid': s[0],'sale_id': s[1], 'product_id': s[2], 'sale_date': s[3], 'quantity': s[4], 'price': s[5], 'category':s[6]} for s in rows],
+        'sales': [{'rowid': s[1],'sale_id': s[0], 'product_id': s[2], 'sale_date': s[3], 'quantity': s[4], 'price': s[5], 'category':s[6]} for s in rows],
         'next_cursor': next_cursor
     })
 
 @app.route('/categories', methods=['GET'])
+@cached_response
 def get_categories():
     """Returns a list of unique categories."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query =  "SELECT category_id, category_name FROM categories products WHERE 1=1 GROUP BY category" 
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    query = "SELECT category_id, category_name FROM categories WHERE 1=1"
+    rows, next_cursor = fetch_paginated_data(query, [], ['category_id'], limit, cursor_val)
     return jsonify({
         'categories': [{ 'category_id': c[0],'category': c[1]} for c in rows],
         'next_cursor': next_cursor
     })
 
 @app.route('/sales/daily_count', methods=['GET'])
+@cached_response
 def get_daily_sales_count():
     """Returns the count of sales per day."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = "SELECT rowid, sale_date, COUNT(*) FROM sales WHERE 1=1 GROUP BY sale_date"
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    # Served from the rollup process_data maintains instead of a GROUP BY over sales, paged on the
+    # grouping key ('' stands for a NULL date)
+    if API_COLUMNAR_CACHE:
+        rows = columnar_sales().daily_counts(read_page_key(cursor_val, 1), limit)
+        next_cursor = next_page_cursor(rows, 1, limit)
+    else:
+        query = "SELECT sale_date, sale_count FROM sales_daily_rollup WHERE 1=1"
+        rows, next_cursor = fetch_paginated_data(query, [], ['sale_date'], limit, cursor_val)
     return jsonify({
-        'daily_sales_count': [{ 'sale_date': c[1], 'count': c[2]} for c in rows],
+        'daily_sales_count': [{ 'sale_date': c[0] or None, 'count': c[1]} for c in rows],
         'next_cursor': next_cursor
     })
 
 @app.route('/sales/product_daily_count', methods=['GET'])
+@cached_response
 def get_product_daily_sales_count():
     """Returns the count of sales per product per day."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = "SELECT rowid, sale_date, product_id, COUNT(*) FROM sales WHERE 1=1 GROUP BY sale_date, product_id "
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    if API_COLUMNAR_CACHE:
+        rows = columnar_sales().product_daily_counts(read_page_key(cursor_val, 2), limit)
+        next_cursor = next_page_cursor(rows, 2, limit)
+    else:
+        query = "SELECT sale_date, product_id, sale_count FROM sales_product_daily_rollup WHERE 1=1"
+        rows, next_cursor = fetch_paginated_data(query, [], ['sale_date', 'product_id'], limit, cursor_val)
     return jsonify({
-        'product_daily_sales_count': [{'sale_date': c[1], 'product_id': c[2], 'count': c[3]} for c in rows],
+        'product_daily_sales_count': [{'sale_date': c[0] or None, 'product_id': c[1], 'count': c[2]} for c in rows],
         'next_cursor': next_cursor
     })
 
 @app.route('/sales/category_sales', methods=['GET'])
+@cached_response
 def get_category_sales():
     """Returns the total sales amount and count per category."""
-    limit = int(request.args.get('limit', 10))
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = """
-        SELECT c.category_name, SUM(s.price * s.quantity), COUNT(s.sale_id)
-        FROM sales s
-        JOIN categories c ON s.category_id = c.category_id
-        GROUP BY c.category_name
-    """
-    rows, next_cursor = fetch_paginated_data(query, [], limit, cursor_val)
+    if API_COLUMNAR_CACHE:
+        rows = columnar_sales().category_sales_after(read_page_key(cursor_val, 1), limit)
+        next_cursor = next_page_cursor(rows, 1, limit)
+    else:
+        query = """
+            SELECT c.category_name, r.total_sales, r.sale_count
+            FROM categories c
+            JOIN sales_category_rollup r ON r.category_id = c.category_id
+            WHERE 1=1
+        """
+        rows, next_cursor = fetch_paginated_data(query, [], ['c.category_name'], limit, cursor_val)
     return jsonify({
         'category_sales': [{'category': s[0], 'total_sales': s[1], 'total_count': s[2]} for s in rows],
         'next_cursor': next_cursor
     })
 
+FILTERED_SALES_COLUMNS = ['sale_id', 'rowid', 'product_id', 'sale_date', 'quantity', 'price', 'category_id']
+
+def _iso_date(name, value):
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        abort(400, description=f"{name} must be a YYYY-MM-DD date")
+
+def _sale_day(iso_date):
+    return (datetime.date.fromisoformat(iso_date) - SALE_DAY_EPOCH).days
+
+def _first_sale_day_from(text):
+    """The first day whose YYYY-MM-DD date sorts at or after text, so a sale_date text range becomes a sale_day one."""
+    low, high = datetime.date.min.toordinal(), datetime.date.max.toordinal() + 1
+    while low < high:
+        middle = (low + high) // 2
+        if datetime.date.fromordinal(middle).isoformat() < text:
+            low = middle + 1
+        else:
+            high = middle
+    return low - SALE_DAY_EPOCH.toordinal()
+
+def filtered_sales_query(filters, select_columns=FILTERED_SALES_COLUMNS):
+    """Builds the /sales/filtered query from its filter parameters, returning (query, params, key_columns, columns).
+
+    Dates are compiled to range predicates on sale_date so every combination can seek on one of the composite
+    sales indexes. With a date filter pages are keyed on (sale_date, sale_id), the order those indexes store.
+    The query selects columns, which start with the page key's values; key_columns are what it orders by,
+    sale_day in place of sale_date with the compact layout.
+    """
+    compact = compact_schema()
+    date_column = 'sale_day' if compact else 'sale_date'
+    conditions, params = [], []
+    date_prefix = filters.get('date')
+    if date_prefix:
+        # A date or a prefix of one (e.g. 2025-04): everything between it and the next prefix up
+        conditions.append(f"{date_column} >= ? AND {date_column} < ?")
+        bounds = [date_prefix, date_prefix[:-1] + chr(ord(date_prefix[-1]) + 1)]
+        params += [_first_sale_day_from(bound) for bound in bounds] if compact else bounds
+    if filters.get('start_date'):
+        conditions.append(f"{date_column} >= ?")
+        start_date = _iso_date('start_date', filters['start_date'])
+        params.append(_sale_day(start_date) if compact else start_date)
+    if filters.get('end_date'):
+        conditions.append(f"{date_column} <= ?")
+        end_date = _iso_date('end_date', filters['end_date'])
+        params.append(_sale_day(end_date) if compact else end_date)
+    has_date_range = bool(conditions)
+    if filters.get('product_id'):
+        if compact:
+            conditions.append("product_key = (SELECT product_key FROM product_keys WHERE product_id = ?)")
+        else:
+            conditions.append("product_id = ?")
+        params.append(filters['product_id'])
+    if filters.get('category'):
+        if filters.get('product_id'):
+            # The unary + keeps the planner on the far more selective product index, but also drops the
+            # column's INTEGER affinity, so the parameter is converted here as the affinity would ('2.0' is 2)
+            conditions.append("+category_id = ?")
+            params.append(_integer_param(filters['category']))
+        else:
+            conditions.append("category_id = ?")
+            params.append(filters['category'])
+
+    # NULL dates cannot be keyset-compared, but a date range already excludes them
+    page_key = ['sale_date', 'sale_id'] if has_date_range else ['sale_id']
+    key_columns = [date_column, 'sale_id'] if has_date_range else ['sale_id']
+    columns = page_key + [c for c in select_columns if c not in page_key]
+    query = f"SELECT {sales_select(columns)} FROM sales WHERE 1=1"
+    for condition in conditions:
+        query += f" AND {condition}"
+    return query, params, key_columns, columns
+
 @app.route('/sales/filtered', methods=['GET'])
+@cached_response
 def get_filtered_sales():
-    """Returns filtered sales based on date and/or product and/or."""
-    date_filter = request.args.get('date')
-    category_filter = request.args.get('category')
-    product_filter = request.args.get('product_id')
-    limit = int(request.args.get('limit', 10))
+    """Returns filtered sales based on a date or date range and/or product and/or category."""
+    limit = page_limit()
     cursor_val = request.args.get('cursor')
-    query = "SELECT rowid, sale_id, product_id, sale_date, quantity, price, category_id FROM sales WHERE 1=1"
-    params = []
-
-    if date_filter:
-        query += " AND sale_date LIKE ?"
-        params.append(f"{date_filter}%")
-    if product_filter:
-        query += " AND product_id = ?"
-        params.append(product_filter)
-    if category_filter:
-        query += " AND category_id = ?"
-        params.append(category_filter)
-
-    rows, next_cursor = fetch_paginated_data(query, params, limit, cursor_val)
+    query, params, key_columns, columns = filtered_sales_query(request.args)
+    if API_COLUMNAR_CACHE:
+        last_key = read_page_key(cursor_val, len(key_columns))
+        rows = columnar_sales().filtered(request.args, key_columns, columns, last_key, limit)
+        next_cursor = next_page_cursor(rows, len(key_columns), limit)
+    else:
+        rows, next_cursor = fetch_paginated_data(query, params, key_columns, limit, cursor_val)
+    sales = [dict(zip(columns, row)) for row in rows]
     return jsonify({
-        'filtered_sales': [{'rowid': s[0], 'sale_id': s[1], 'product_id': s[2], 'sale_date': s[3], 'quantity': s[4], 'price': s[5], 'category':s[6]} for s in rows],
+        'filtered_sales': [{'rowid': s['rowid'], 'sale_id': s['sale_id'], 'product_id': s['product_id'], 'sale_date': s['sale_date'], 'quantity': s['quantity'], 'price': s['price'], 'category': s['category_id']} for s in sales],
         'next_cursor': next_cursor
     })
 
+EXPORT_FETCH_SIZE = 5000  # Rows per fetchmany while streaming an export
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_SALES_COLUMNS = ['sale_id', 'product_id', 'sale_date', 'quantity', 'price', 'category_id']
+
+def _export_query(dataset, filters):
+    """Returns (query, params, columns) for an export, ordered so the output is stable."""
+    if dataset == 'products':
+        columns = ['product_id', 'product_name', 'category_id']
+        return f"SELECT {', '.join(columns)} FROM products ORDER BY product_id", [], columns
+    query, params, key_columns, columns = filtered_sales_query(filters, EXPORT_SALES_COLUMNS)
+    return f"{query} ORDER BY {', '.join(key_columns)}", params, columns
+
+def _export_lines(query, params, columns, export_format):
+    """Yields the export as text, one fetchmany batch at a time, so memory stays flat for any result size."""
+    with pooled_connection() as conn:
+        db_cursor = conn.execute(query, params)
+        try:
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+            while True:
+                rows = db_cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                if export_format == 'csv':
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                else:
+                    yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+        finally:
+            # Ends the read even if the client disconnected mid-stream, before the connection goes back
+            db_cursor.close()
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/export/<dataset>', methods=['GET'])
+def export_data(dataset):
+    """Streams all of sales (filterable like /sales/filtered) or products as NDJSON or CSV, gzipped if accepted."""
+    if dataset not in ('sales', 'products'):
+        abort(404)
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        abort(400, description=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    # Built before streaming starts so bad filters still get a 400
+    query, params, columns = _export_query(dataset, request.args)
+
+    body = _export_lines(query, params, columns, export_format)
+    headers = {'Content-Disposition': f'attachment; filename="{dataset}.{export_format}"', 'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip'] > 0:  # Honours q-values, so gzip;q=0 refuses it
+        body = _gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Returns response cache hit/miss counters, size and the data version it holds, and the columnar cache's."""
+    sales = _columnar['sales']
+    columnar = {'enabled': API_COLUMNAR_CACHE, 'rows': sales.rows if sales else 0,
+                'data_version': sales.version if sales else None}
+    with _cache_lock:
+        return jsonify({
+            'hits': _cache_state['hits'],
+            'misses': _cache_state['misses'],
+            'evictions': _cache_state['evictions'],
+            'size': len(_response_cache),
+            'max_size': API_CACHE_SIZE,
+            'data_version': _cache_state['version'][1] if _cache_state['version'] else None,
+            'columnar': columnar,
+        })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Returns per-endpoint request counts, latency histograms (ms) and time spent in SQL since startup."""
+    with _metrics_lock:
+        endpoints = {
+            endpoint: {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                'queries': stats['queries'],
+                'mean_latency_ms': round(stats['latency_ms'] / stats['requests'], 3),
+                'mean_sql_ms': round(stats['sql_ms'] / stats['requests'], 3),
+                'sql_share': round(stats['sql_ms'] / stats['latency_ms'], 3) if stats['latency_ms'] else None,
+                'p50_ms_le': _histogram_quantile(stats['buckets'], 0.5),
+                'p99_ms_le': _histogram_quantile(stats['buckets'], 0.99),
+                'latency_histogram': list(stats['buckets']),  # Counts per bucket in buckets_ms
+            }
+            for endpoint, stats in _endpoint_metrics.items()
+        }
+    return jsonify({'endpoints': endpoints, 'buckets_ms': list(LATENCY_BUCKETS_MS) + ['+Inf']})
+
 @app.route('/help', methods=['GET'])
 def help_route():
     """Returns a list of available routes and their usage."""
@@ -213,4 +1012,6 @@ def help_route():
 
 
 if __name__ == "__main__":
+    if API_COLUMNAR_CACHE and os.path.exists(DB_PATH):
+        columnar_sales()  # Load before the first request rather than during it
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,129 @@
+# api_async.py
+"""Async entry point serving the API's routes from an aiohttp event loop.
+
+Requests are accepted and held by the event loop; the Flask app in api.py (routes, rate limiting and
+auth, response shapes) runs unchanged as a WSGI app on a bounded thread pool, so blocking SQLite work
+never stalls the loop and at most ASYNC_DB_WORKERS requests touch the database at once.
+"""
+import io
+import sys
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from aiohttp import web
+
+import api
+
+ASYNC_DB_WORKERS = 16  # Threads running Flask views (and so SQLite queries)
+ASYNC_MAX_PENDING = 512  # Requests handed to the pool at once; the rest wait in the event loop
+
+
+def _wsgi_environ(request, body):
+    """Builds the WSGI environ for an aiohttp request."""
+    host, _, port = (request.host or 'localhost').partition(':')
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote(request.raw_path.split('?', 1)[0], encoding='latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': port or ('443' if request.secure else '80'),
+        'SERVER_PROTOCOL': f"HTTP/{request.version.major}.{request.version.minor}",
+        'REMOTE_ADDR': request.remote or '',
+        'CONTENT_TYPE': request.headers.get('Content-Type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in request.headers.items():
+        key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH'):
+            continue
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def _call_wsgi(environ):
+    """Runs the Flask app on one request; returns (status, headers, body).
+
+    A response with a Content-Length is read whole here, on the worker thread, and its body returned as
+    bytes; any other (e.g. /export) is returned as its iterable, to be streamed.
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, headers
+
+    body = api.app(environ, start_response)
+    if any(name.lower() == 'content-length' for name, _ in started['headers']):
+        try:
+            return started['status'], started['headers'], b''.join(body)
+        finally:
+            _close(body)
+    return started['status'], started['headers'], body
+
+def _next_chunk(iterator):
+    return next(iterator, None)
+
+def _close(body):
+    if hasattr(body, 'close'):
+        body.close()
+
+async def handle(request):
+    """Serves one request through the Flask app on the executor."""
+    app = request.app
+    loop = asyncio.get_running_loop()
+    body = await request.read()
+    async with app['pending']:
+        status, headers, response_body = await loop.run_in_executor(
+            app['executor'], _call_wsgi, _wsgi_environ(request, body))
+        status_code, _, reason = status.partition(' ')
+
+        if isinstance(response_body, bytes):
+            return web.Response(body=response_body, status=int(status_code), reason=reason, headers=headers)
+        try:
+            # Responses without a length (e.g. /export) are pulled from the generator one chunk at a time
+            response = web.StreamResponse(status=int(status_code), reason=reason, headers=headers)
+            await response.prepare(request)
+            iterator = iter(response_body)
+            while True:
+                chunk = await loop.run_in_executor(app['executor'], _next_chunk, iterator)
+                if chunk is None:
+                    break
+                await response.write(chunk)
+            await response.write_eof()
+            return response
+        finally:
+            await loop.run_in_executor(app['executor'], _close, response_body)
+
+async def _shutdown_executor(app):
+    app['executor'].shutdown(wait=True)
+
+def create_app(workers=ASYNC_DB_WORKERS, max_pending=ASYNC_MAX_PENDING):
+    """Creates the aiohttp application serving every route of api.app."""
+    app = web.Application()
+    app['executor'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-db')
+    app['pending'] = asyncio.Semaphore(max_pending)
+    app.router.add_route('*', '/{tail:.*}', handle)
+    app.on_cleanup.append(_shutdown_executor)
+    return app
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the API from an aiohttp event loop.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=ASYNC_DB_WORKERS,
+                        help=f"Threads running views and SQLite queries (default: {ASYNC_DB_WORKERS})")
+    parser.add_argument('--max-pending', type=int, default=ASYNC_MAX_PENDING,
+                        help=f"Requests in the thread pool at once (default: {ASYNC_MAX_PENDING})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(create_app(args.workers, args.max_pending), host=args.host, port=args.port)
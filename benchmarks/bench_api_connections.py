@@ -0,0 +1,104 @@
+"""Requests/sec and tail latency of the API with per-request connections versus the read-only pool.
+
+Builds a synthetic database, then drives the Flask app from several client threads.
+Run from the repo root:
+
+    python -m benchmarks.bench_api_connections --threads 8 --requests 2000
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import api
+from benchmarks.bench_sales_load import write_sales_csv
+from data_ingestion.process_data_to_silver import process_data
+
+ENDPOINTS = [
+    "/products?limit=10",
+    "/sales?limit=10",
+    "/sales/daily_count?limit=10",
+    "/sales/category_sales",
+    "/sales/filtered?product_id=P000042&limit=10",
+]
+
+
+def build_benchmark_db(db_path, files=20, rows=50_000, products=10_000, compact=False):
+    """Loads synthetic product and sales files into db_path with process_data (with the compact schema if set)."""
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as data_dir:
+        with open(os.path.join(data_dir, 'product_info.json'), 'w') as f:
+            json.dump([{'product_id': f"P{i:06}", 'product_name': f"Product {i}", 'category': f"Category {i % 4}"}
+                       for i in range(1, products + 1)], f)
+        for day in range(files):
+            write_sales_csv(os.path.join(data_dir, f"sales_data_{day:04}.csv"), rows, products, seed=day)
+        process_data(data_dir, db_path, files=sorted(os.listdir(data_dir)), compact=compact)
+    logging.disable(logging.NOTSET)
+
+def connect_per_request(query, params=()):
+    """The previous execute_query: a fresh connection for every query."""
+    conn = sqlite3.connect(api.DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def load_test(threads, requests_per_thread):
+    """Returns (requests/sec, per-request latencies in ms)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def client_thread():
+        client = api.app.test_client()
+        local = []
+        for i in range(requests_per_thread):
+            started = time.perf_counter()
+            response = client.get(ENDPOINTS[i % len(ENDPOINTS)])
+            local.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=client_thread) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+def report(label, throughput, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>22}: {throughput:>9,.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per thread")
+    parser.add_argument('--db', help="Existing database to query instead of a synthetic one")
+    args = parser.parse_args()
+
+    api.API_RATE_LIMIT = float('inf')
+    with tempfile.TemporaryDirectory() as tmp:
+        api.DB_PATH = args.db or os.path.join(tmp, 'bench.db')
+        if not args.db:
+            build_benchmark_db(api.DB_PATH)
+
+        pooled_execute_query = api.execute_query
+        for label, execute_query in (("connect per request", connect_per_request),
+                                     ("pooled read-only", pooled_execute_query)):
+            api.execute_query = execute_query
+            load_test(args.threads, 50)  # warm up
+            report(label, *load_test(args.threads, args.requests))
+        api.execute_query = pooled_execute_query
+
+if __name__ == "__main__":
+    main()
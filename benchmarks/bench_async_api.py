@@ -0,0 +1,117 @@
+"""Load test of the threaded Flask server versus the aiohttp entry point (api_async.py) at 1k concurrent clients.
+
+Builds a synthetic database, starts each server in its own process and drives it with concurrent
+keep-alive HTTP clients from this process. Run from the repo root:
+
+    python -m benchmarks.bench_async_api --clients 1000 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from benchmarks.bench_api_connections import ENDPOINTS, build_benchmark_db
+
+SERVERS = ('flask', 'aiohttp')
+
+
+def serve(server, db_path, port):
+    """Child process: runs one server against db_path with rate limiting off."""
+    import api
+    api.DB_PATH = db_path
+    api.API_RATE_LIMIT = float('inf')
+    if server == 'flask':
+        api.app.run(host='127.0.0.1', port=port, threaded=True)
+    else:
+        import api_async
+        from aiohttp import web
+        web.run_app(api_async.create_app(), host='127.0.0.1', port=port, print=None)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+async def load_test(port, clients, requests_per_client):
+    """Returns (requests/sec, latencies in ms, errors)."""
+    latencies, errors = [], 0
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def client(n):
+            nonlocal errors
+            for i in range(requests_per_client):
+                url = f"http://127.0.0.1:{port}{ENDPOINTS[(n + i) % len(ENDPOINTS)]}"
+                started = time.perf_counter()
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, latencies, errors
+
+def report(label, throughput, latencies, errors):
+    latencies = sorted(latencies) or [float('nan')]
+    p50 = statistics.median(latencies)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"{label:>8}: {throughput:>8,.0f} req/s  p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  "
+          f"max {latencies[-1]:8.1f} ms  errors {errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=1000, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=20, help="Requests per client")
+    parser.add_argument('--db', help="Existing database to serve instead of a synthetic one")
+    parser.add_argument('--serve', choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.db, args.port)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, 'bench.db')
+        if not args.db:
+            build_benchmark_db(db_path)
+        for server in SERVERS:
+            port = free_port()
+            child = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_async_api', '--serve', server,
+                                      '--db', db_path, '--port', str(port)],
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(port)
+                asyncio.run(load_test(port, 50, 2))  # warm up
+                report(server, *asyncio.run(load_test(port, args.clients, args.requests)))
+            finally:
+                child.terminate()
+                child.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Incremental commit pattern versus bulk-load mode on a backfill into an existing, indexed table.
+
+A base database is loaded first with the default mode; each mode then loads the
+backfill files into its own copy of it. Run from the repo root:
+
+    python -m benchmarks.bench_bulk_load --files 40 --rows 100000
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.bench_sales_load import write_sales_csv
+from data_ingestion.process_data_to_silver import process_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-files', type=int, default=20, help="Sales files already in the database")
+    parser.add_argument('--files', type=int, default=40, help="Sales files in the backfill")
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows per sales file")
+    parser.add_argument('--products', type=int, default=10_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_dir, backfill_dir = os.path.join(tmp, 'base'), os.path.join(tmp, 'backfill')
+        os.makedirs(base_dir)
+        os.makedirs(backfill_dir)
+        with open(os.path.join(base_dir, 'product_info.json'), 'w') as f:
+            json.dump([{'product_id': f"P{i:06}", 'product_name': f"Product {i}", 'category': f"Category {i % 4}"}
+                       for i in range(1, args.products + 1)], f)
+        for day in range(args.base_files + args.files):
+            target = base_dir if day < args.base_files else backfill_dir
+            write_sales_csv(os.path.join(target, f"sales_data_{day:04}.csv"), args.rows, args.products, seed=day)
+
+        base_db = os.path.join(tmp, 'base.db')
+        process_data(base_dir, base_db, files=sorted(os.listdir(base_dir)))
+        backfill_files = sorted(os.listdir(backfill_dir))
+
+        print(f"backfill of {args.files} files x {args.rows:,} rows onto {args.base_files * args.rows:,} existing rows")
+        baseline = None
+        for label, bulk in (("per-batch commits", None), ("bulk, commit per file", 'file'), ("bulk, commit per run", 'run')):
+            db_path = os.path.join(tmp, f"bench_{bulk}.db")
+            shutil.copy(base_db, db_path)
+            started = time.perf_counter()
+            process_data(backfill_dir, db_path, files=backfill_files, bulk=bulk)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            rows = sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+            print(f"{label:>24}: {elapsed:>7.2f}s {args.files * args.rows / elapsed:>12,.0f} rows/sec "
+                  f"{baseline / elapsed:>6.2f}x  ({rows:,} rows)")
+
+if __name__ == "__main__":
+    main()
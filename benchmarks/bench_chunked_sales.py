@@ -0,0 +1,88 @@
+"""Peak RSS of process_data on one large sales CSV, whole-file versus chunked.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_chunked_sales --rows 5000000 --chunk-size 100000
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_sales_load import write_sales_csv
+
+
+def peak_rss_mb():
+    """Peak RSS of this process. VmHWM resets on exec, unlike ru_maxrss which keeps the forking parent's peak."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_child(data_dir, db_path, chunk_size):
+    """Entry point of the measured child process."""
+    import logging
+    from data_ingestion.process_data_to_silver import process_data
+    logging.disable(logging.INFO)
+    started = time.perf_counter()
+    process_data(data_dir, db_path, files=sorted(os.listdir(data_dir)), chunk_size=chunk_size or None)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak_rss_mb()}))
+
+def measure(data_dir, db_path, chunk_size):
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_chunked_sales', '--child', data_dir, db_path, str(chunk_size or 0)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def table_digest(db_path):
+    conn = sqlite3.connect(db_path)
+    # Category ids depend on insertion order, so compare by name
+    digest = tuple(conn.execute(
+        "SELECT c.category_name, COUNT(*), SUM(s.quantity), ROUND(SUM(s.price), 2), COUNT(DISTINCT s.sale_date) "
+        "FROM sales s JOIN categories c ON s.category_id = c.category_id GROUP BY c.category_name ORDER BY 1"
+    ).fetchall())
+    conn.close()
+    return digest
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        os.makedirs(data_dir)
+        with open(os.path.join(data_dir, 'product_info.json'), 'w') as f:
+            json.dump([{'product_id': f"P{i:06}", 'product_name': f"Product {i}", 'category': f"Category {i % 4}"}
+                       for i in range(1, args.products + 1)], f)
+        write_sales_csv(os.path.join(data_dir, 'sales_data.csv'), args.rows, args.products)
+        print(f"sales file: {os.path.getsize(os.path.join(data_dir, 'sales_data.csv')) / 1e6:.0f} MB")
+
+        digests = {}
+        for name, chunk_size in (("whole file", None), (f"chunks of {args.chunk_size}", args.chunk_size)):
+            db_path = os.path.join(tmp, f"bench_{chunk_size or 0}.db")
+            result = measure(data_dir, db_path, chunk_size)
+            digests[name] = table_digest(db_path)
+            print(f"{name:>20}: peak RSS {result['peak_rss_mb']:>8.0f} MB, {result['seconds']:.1f}s")
+
+    print("outputs identical:", len(set(digests.values())) == 1)
+
+if __name__ == "__main__":
+    main()
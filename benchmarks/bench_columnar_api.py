@@ -0,0 +1,101 @@
+"""Latency of the analytics routes served by SQL against the in-memory columnar cache (API_COLUMNAR_CACHE).
+
+Builds a synthetic database, loads the columnar copy once, then times the first and a later page of each
+route both ways through the Flask test client, with the response cache cleared before every request so
+each one is computed. Every page is checked to match between the two paths first. Finally one more
+file is loaded and the incremental refresh is timed against a full reload. Run from the repo root:
+
+    python -m benchmarks.bench_columnar_api --files 20 --rows 100000 --requests 200
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import api
+from benchmarks.bench_api_connections import build_benchmark_db
+from benchmarks.bench_sales_load import write_sales_csv
+from data_ingestion.process_data_to_silver import process_data
+
+ROUTES = [
+    ("/sales/daily_count?limit=100", 'daily_sales_count'),
+    ("/sales/product_daily_count?limit=100", 'product_daily_sales_count'),
+    ("/sales/category_sales", 'category_sales'),
+    ("/sales/filtered?product_id=P000042&limit=100", 'filtered_sales'),
+    ("/sales/filtered?category=2&limit=100", 'filtered_sales'),
+    ("/sales/filtered?date=2025-03&limit=100", 'filtered_sales'),
+    ("/sales/filtered?start_date=2025-06-01&end_date=2025-06-30&category=3&limit=100", 'filtered_sales'),
+]
+
+
+def get(client, url, columnar):
+    api.API_COLUMNAR_CACHE = columnar
+    api._response_cache.clear()
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response.get_json()
+
+def later_page(client, url, key, pages=5):
+    """The URL of a page a few pages in, so the cursor is exercised."""
+    page_url = url
+    for _ in range(pages):
+        cursor = get(client, page_url, False)['next_cursor']
+        if not cursor:
+            break
+        page_url = f"{url}&cursor={cursor}" if '?' in url else f"{url}?cursor={cursor}"
+    return page_url
+
+def rounded(rows):
+    # Totals are summed in a different order, so they agree only to rounding
+    return [{k: round(v, 4) if isinstance(v, float) else v for k, v in row.items()} for row in rows]
+
+def time_requests(client, url, columnar, requests):
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        get(client, url, columnar)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20, help="Sales files loaded")
+    parser.add_argument('--rows', type=int, default=100_000, help="Sales rows per file")
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=200, help="Requests timed per route and path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api.DB_PATH = os.path.join(tmp, 'database.db')
+        api.API_RATE_LIMIT = 10**9
+        build_benchmark_db(api.DB_PATH, files=args.files, rows=args.rows, products=args.products)
+        started = time.perf_counter()
+        sales = api.columnar_sales()
+        print(f"Columnar load of {sales.rows:,} sales: {time.perf_counter() - started:.2f}s")
+
+        client = api.app.test_client()
+        for url, key in ROUTES:
+            for label, page_url in (("first", url), ("later", later_page(client, url, key))):
+                sql_rows, columnar_rows = get(client, page_url, False), get(client, page_url, True)
+                assert rounded(sql_rows[key]) == rounded(columnar_rows[key]), f"{page_url}: results differ"
+                assert sql_rows['next_cursor'] == columnar_rows['next_cursor'], f"{page_url}: cursors differ"
+                sql_ms = time_requests(client, page_url, False, args.requests)
+                columnar_ms = time_requests(client, page_url, True, args.requests)
+                print(f"{url.split('&limit')[0].split('?limit')[0]:<70} {label:>5} page: SQL {sql_ms:8.2f} ms  "
+                      f"columnar {columnar_ms:8.2f} ms  ({sql_ms / columnar_ms:5.1f}x)")
+
+        logging.disable(logging.WARNING)
+        write_sales_csv(os.path.join(tmp, 'sales_data_next.csv'), args.rows, args.products, seed=args.files)
+        process_data(tmp, api.DB_PATH, files=['sales_data_next.csv'])
+        started = time.perf_counter()
+        refreshed = api.ColumnarSales.load(sales)
+        refresh_s = time.perf_counter() - started
+        started = time.perf_counter()
+        api.ColumnarSales.load()
+        print(f"After loading {refreshed.rows - sales.rows:,} more sales: refresh {refresh_s:.2f}s, "
+              f"full reload {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Database size, load time and API query time with the text sales schema against the compact one.
+
+Loads the same synthetic files into a database with each schema (process_data, and process_data with
+compact=True), then reports the file size, the space taken by sales and each of its indexes (from SQLite's
+dbstat table), and the median latency of the routes that read sales, with the response cache cleared before
+every request. Every route's first page is checked to match between the two first. Run from the repo root:
+
+    python -m benchmarks.bench_compact_schema --files 20 --rows 100000 --requests 200
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import api
+from benchmarks.bench_api_connections import build_benchmark_db
+
+ROUTES = [
+    "/sales?limit=100",
+    "/sales/filtered?product_id=P000042&limit=100",
+    "/sales/filtered?product_id=P000042&start_date=2025-03-01&end_date=2025-05-31&limit=100",
+    "/sales/filtered?category=2&limit=100",
+    "/sales/filtered?date=2025-03&limit=100",
+    "/sales/filtered?start_date=2025-06-01&end_date=2025-06-30&category=3&limit=100",
+]
+
+
+def space_by_object(db_path):
+    """Bytes used by sales, product_keys and their indexes."""
+    conn = sqlite3.connect(db_path)
+    sizes = dict(conn.execute("""
+        SELECT name, SUM(pgsize) FROM dbstat
+        WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN ('sales', 'product_keys'))
+        GROUP BY name
+    """))
+    conn.close()
+    return sizes
+
+def median_ms(client, url, requests):
+    client.get(url)  # Opens the pooled connection and warms the page cache
+    latencies = []
+    for _ in range(requests):
+        api._response_cache.clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20, help="Sales files loaded")
+    parser.add_argument('--rows', type=int, default=100_000, help="Sales rows per file")
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=200, help="Requests timed per route and schema")
+    args = parser.parse_args()
+    api.API_RATE_LIMIT = 10**9
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, compact in (("text", False), ("compact", True)):
+            db_path = os.path.join(tmp, f"{name}.db")
+            started = time.perf_counter()
+            build_benchmark_db(db_path, files=args.files, rows=args.rows, products=args.products, compact=compact)
+            results[name] = {'db_path': db_path, 'load_s': time.perf_counter() - started,
+                             'size': os.path.getsize(db_path), 'objects': space_by_object(db_path)}
+
+        client = api.app.test_client()
+        for url in ROUTES:
+            responses = []
+            for name in results:
+                api.DB_PATH = results[name]['db_path']
+                api._response_cache.clear()
+                responses.append(client.get(url).get_json())
+            assert responses[0] == responses[1], f"{url}: responses differ"
+
+        text, compact = results['text'], results['compact']
+        print(f"{'':<44} {'text':>12} {'compact':>12}")
+        print(f"{'load time (s)':<44} {text['load_s']:>12.2f} {compact['load_s']:>12.2f}")
+        print(f"{'database file (MB)':<44} {text['size'] / 2**20:>12.1f} {compact['size'] / 2**20:>12.1f}")
+        for obj in sorted(text['objects'].keys() | compact['objects'].keys()):
+            sizes = [results[name]['objects'].get(obj) for name in results]
+            print(f"{obj + ' (MB)':<44} " + " ".join(f"{s / 2**20:>12.1f}" if s else f"{'-':>12}" for s in sizes))
+        for url in ROUTES:
+            latencies = []
+            for name in results:
+                api.DB_PATH = results[name]['db_path']
+                latencies.append(median_ms(client, url, args.requests))
+            print(f"{url.replace('&limit=100', '').replace('?limit=100', '')[:44]:<44} "
+                  f"{latencies[0]:>9.2f} ms {latencies[1]:>9.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Bytes transferred and time to download and load plain inputs against the same files gzip or zstd compressed.
+
+Generates sales files and a product catalog, writes gzip (.gz) and, if zstandard is installed, zstd (.zst)
+copies of them, and for each variant downloads the files from a local SFTP stand-in
+(sftp_setup/start_sftp.py) with ingest, best of --repeat cold-manifest runs, then loads them with
+process_data. The stand-in runs on loopback, so download times understate what compression saves over
+a real link. Run from the repo root:
+
+    python -m benchmarks.bench_compressed_inputs --days 8 --sales-per-file 500000
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.run_benchmarks import free_port, sftp_server
+from data_ingestion import ingest_to_bronze
+from data_ingestion.process_data_to_silver import process_data
+from data_ingestion.readers import zstandard
+from sftp_setup.generate_test_data import generate_data_files
+
+
+def compress_copies(plain_dir, target_dir, suffix, compress):
+    os.makedirs(target_dir)
+    for file in os.listdir(plain_dir):
+        with open(os.path.join(plain_dir, file), 'rb') as src:
+            with open(os.path.join(target_dir, file + suffix), 'wb') as dst:
+                dst.write(compress(src.read()))
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=8, help="Sales files (one per day)")
+    parser.add_argument('--sales-per-file', type=int, default=500_000)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3, help="Downloads per variant; the fastest is reported")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        remote = os.path.join(tmp, 'remote')
+        variants = {'plain': os.path.join(remote, 'plain'), 'gzip': os.path.join(remote, 'gzip')}
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data_files(args.days, num_products=args.products, sales_per_file=args.sales_per_file,
+                                product_days=1, workers=os.cpu_count(), data_dir=variants['plain'])
+        compress_copies(variants['plain'], variants['gzip'], '.gz', lambda data: gzip.compress(data, 6))
+        if zstandard is not None:
+            variants['zstd'] = os.path.join(remote, 'zstd')
+            compress_copies(variants['plain'], variants['zstd'], '.zst', zstandard.ZstdCompressor(level=3).compress)
+        else:
+            print("zstandard is not installed; skipping zstd")
+
+        port = free_port()
+        ingest_to_bronze.SFTP_HOST, ingest_to_bronze.SFTP_PORT = '127.0.0.1', port
+        with sftp_server(tmp, port):
+            for name, remote_dir in variants.items():
+                ingest_to_bronze.SFTP_REMOTE_DIR = os.path.relpath(remote_dir, tmp)
+                local_dir = os.path.join(tmp, 'local', name)
+                download_s = float('inf')
+                for attempt in range(args.repeat):
+                    if attempt:
+                        shutil.rmtree(local_dir)  # Manifest included, so every attempt downloads everything
+                    started = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        files = ingest_to_bronze.ingest(local_dir, workers=args.download_workers)
+                    download_s = min(download_s, time.perf_counter() - started)
+                started = time.perf_counter()
+                process_data(local_dir, os.path.join(tmp, f"{name}.db"), files=files)
+                load_s = time.perf_counter() - started
+                print(f"{name:>6}: {dir_bytes(remote_dir) / 2**20:>8.1f} MB transferred  "
+                      f"download {download_s:>6.2f}s  load {load_s:>6.2f}s  total {download_s + load_s:>6.2f}s")
+
+if __name__ == "__main__":
+    main()
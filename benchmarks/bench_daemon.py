@@ -0,0 +1,106 @@
+"""Time to load and freshness lag: one-shot run_pipeline (download all, then load) versus the overlapping daemon.
+
+Generates sales files into a local SFTP stand-in (sftp_setup/start_sftp.py), then loads them into a fresh
+database both ways. The database is created (with its indexes) before timing, as for any load after the
+first. Remote mtimes are reset to the start of each run, so freshness lag is the time from the run
+starting to a file's rows being queryable. Run from the repo root:
+
+    python -m benchmarks.bench_daemon --days 12 --sales-per-file 500000
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import pipeline
+from benchmarks.run_benchmarks import free_port, sftp_server
+from data_ingestion import ingest_to_bronze
+from data_ingestion.ingest_to_bronze import load_manifest
+from data_ingestion.process_data_to_silver import process_data
+from sftp_setup.generate_test_data import generate_data_files
+
+
+def loaded_files(local_dir):
+    """Files the manifest marks processed, i.e. whose load (indexes included) has finished."""
+    return sum(1 for entry in load_manifest(local_dir).values() if entry.get('processed'))
+
+def touch(remote_dir):
+    now = int(time.time())  # SFTP reports whole-second mtimes
+    for file in os.listdir(remote_dir):
+        os.utime(os.path.join(remote_dir, file), (now, now))
+    return now
+
+def run_once(work_dir, remote_dir, args):
+    """One-shot pipeline: every file becomes queryable when the whole run ends."""
+    started = touch(remote_dir)
+    pipeline.run_pipeline(download_workers=args.download_workers, gold=False,
+                          report_path=os.path.join(work_dir, 'once.json'))
+    elapsed = time.time() - started
+    return {'total_s': elapsed, 'lag_mean_s': elapsed, 'lag_max_s': elapsed}
+
+def run_daemon(work_dir, remote_dir, args, file_count):
+    """Daemon: stopped once every file is loaded; lag comes from its run report."""
+    stop = threading.Event()
+    report_path = os.path.join(work_dir, 'daemon.json')
+    done = {}
+
+    def watch():
+        while loaded_files(pipeline.LOCAL_DATA_DIR) < file_count:
+            time.sleep(0.05)
+        done['at'] = time.time()
+        stop.set()
+
+    started = touch(remote_dir)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    pipeline.run_daemon(download_workers=args.download_workers, gold=False, poll_interval=1.0,
+                        queue_size=args.queue_size, report_path=report_path, stop=stop)
+    watcher.join()
+    with open(report_path) as f:
+        freshness = json.load(f)['stages']['freshness']
+    return {'total_s': done['at'] - started, 'lag_mean_s': freshness['lag_s'] / freshness['files'],
+            'lag_max_s': freshness['lag_max_s']}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=12, help="Sales files (one per day)")
+    parser.add_argument('--sales-per-file', type=int, default=500_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--download-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=pipeline.DAEMON_QUEUE_SIZE)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        remote_dir = os.path.join(tmp, 'remote')
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data_files(args.days, num_products=args.products, sales_per_file=args.sales_per_file,
+                                product_days=1, workers=os.cpu_count(), data_dir=remote_dir)
+        file_count = len(os.listdir(remote_dir))
+        size_mb = sum(os.path.getsize(os.path.join(remote_dir, f)) for f in os.listdir(remote_dir)) / 2**20
+        print(f"{file_count} files, {size_mb:.0f} MB")
+
+        port = free_port()
+        ingest_to_bronze.SFTP_HOST, ingest_to_bronze.SFTP_PORT = '127.0.0.1', port
+        ingest_to_bronze.SFTP_REMOTE_DIR = 'remote'
+        with sftp_server(tmp, port):
+            for name, run in (("one-shot", run_once), ("daemon", run_daemon)):
+                work_dir = os.path.join(tmp, name)
+                os.makedirs(work_dir)
+                pipeline.LOCAL_DATA_DIR = os.path.join(work_dir, 'data')
+                pipeline.DB_PATH = os.path.join(work_dir, 'database.db')
+                os.makedirs(pipeline.LOCAL_DATA_DIR)
+                process_data(pipeline.LOCAL_DATA_DIR, pipeline.DB_PATH)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = run(work_dir, remote_dir, args) if name == "one-shot" else \
+                        run(work_dir, remote_dir, args, file_count)
+                print(f"{name:>9}: all loaded in {result['total_s']:6.1f}s  freshness lag mean "
+                      f"{result['lag_mean_s']:6.1f}s  max {result['lag_max_s']:6.1f}s")
+
+if __name__ == "__main__":
+    main()
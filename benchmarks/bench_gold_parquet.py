@@ -0,0 +1,92 @@
+"""Category revenue per month: SQLite GROUP BY over sales versus the date-partitioned Parquet gold layer.
+
+Builds a synthetic database, writes the gold layer with write_gold, then times the same aggregate
+both ways over the whole year and over one month (where the Parquet side prunes partitions).
+Run from the repo root:
+
+    python -m benchmarks.bench_gold_parquet --files 20 --rows 100000
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_api_connections import build_benchmark_db
+from benchmarks.bench_sales_load import write_sales_csv
+from data_ingestion.export_to_gold import write_gold, query_gold
+from data_ingestion.process_data_to_silver import process_data
+
+SQLITE_QUERY = """
+    SELECT c.category_name, substr(s.sale_date, 1, 7) AS month, SUM(s.quantity * s.price) AS revenue
+    FROM sales s JOIN categories c ON c.category_id = s.category_id
+    WHERE s.sale_date BETWEEN ? AND ?
+    GROUP BY 1, 2
+"""
+
+
+def sqlite_revenue(db_path, start_date, end_date):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(SQLITE_QUERY, (start_date, end_date)).fetchall()
+    conn.close()
+    return {(category, month): revenue for category, month, revenue in rows}
+
+def parquet_revenue(gold_dir, start_date, end_date):
+    df = query_gold(gold_dir, ['sale_date', 'category_name', 'revenue'], start_date, end_date)
+    grouped = df.groupby([df['category_name'], df['sale_date'].str[:7]])['revenue'].sum()
+    return grouped.to_dict()
+
+def best_of(repeats, func, *args):
+    timings, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows per sales file")
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path, gold_dir = os.path.join(tmp, 'bench.db'), os.path.join(tmp, 'gold')
+        build_benchmark_db(db_path, files=args.files, rows=args.rows, products=args.products)
+        logging.disable(logging.INFO)
+
+        started = time.perf_counter()
+        write_gold(db_path, gold_dir)
+        print(f"full gold write: {time.perf_counter() - started:.2f}s, "
+              f"{directory_size(gold_dir) / 2**20:.1f} MB Parquet vs {os.path.getsize(db_path) / 2**20:.1f} MB SQLite")
+
+        # A day's file arrives; only the partition it touched is rewritten
+        data_dir = os.path.join(tmp, 'increment')
+        os.makedirs(data_dir)
+        increment_path = os.path.join(data_dir, 'sales_data_new.csv')
+        write_sales_csv(increment_path, 1_000, args.products, seed=10_000)
+        pd.read_csv(increment_path).assign(sale_date='2025-12-31').to_csv(increment_path, index=False)
+        summary = process_data(data_dir, db_path)
+        started = time.perf_counter()
+        write_gold(db_path, gold_dir, summary['sale_dates'])
+        print(f"incremental write of {len(summary['sale_dates'])} partitions: {time.perf_counter() - started:.2f}s")
+
+        for label, (start_date, end_date) in (("full year", ("2025-01-01", "2025-12-31")),
+                                              ("one month", ("2025-06-01", "2025-06-30"))):
+            sqlite_time, expected = best_of(args.repeats, sqlite_revenue, db_path, start_date, end_date)
+            parquet_time, actual = best_of(args.repeats, parquet_revenue, gold_dir, start_date, end_date)
+            assert expected.keys() == actual.keys(), "results differ"
+            assert all(abs(expected[k] - actual[k]) <= 1e-6 * abs(expected[k]) for k in expected), "results differ"
+            print(f"{label:>9}: SQLite GROUP BY {sqlite_time:.3f}s  Parquet {parquet_time:.3f}s  "
+                  f"({sqlite_time / parquet_time:.1f}x)")
+
+if __name__ == "__main__":
+    main()
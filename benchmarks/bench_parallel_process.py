@@ -0,0 +1,56 @@
+"""Scaling of process_data with 1..N parse/clean worker processes and a single SQLite writer.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_parallel_process --files 64 --rows 100000
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.bench_sales_load import write_sales_csv
+from data_ingestion.process_data_to_silver import process_data
+
+
+def default_worker_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=64, help="Number of daily sales files")
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows per sales file")
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, 'data')
+        os.makedirs(data_dir)
+        with open(os.path.join(data_dir, 'product_info.json'), 'w') as f:
+            json.dump([{'product_id': f"P{i:06}", 'product_name': f"Product {i}", 'category': f"Category {i % 4}"}
+                       for i in range(1, args.products + 1)], f)
+        for day in range(args.files):
+            write_sales_csv(os.path.join(data_dir, f"sales_data_{day:04}.csv"), args.rows, args.products, seed=day)
+        files = sorted(os.listdir(data_dir))
+
+        baseline = None
+        print(f"{args.files} files x {args.rows:,} rows on {os.cpu_count()} cores")
+        print(f"{'workers':>8} {'seconds':>10} {'rows/sec':>12} {'speedup':>8}")
+        for workers in args.workers:
+            db_path = os.path.join(tmp, f"bench_{workers}.db")
+            started = time.perf_counter()
+            process_data(data_dir, db_path, files=files, workers=workers)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {args.files * args.rows / elapsed:>12,.0f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Peak memory of json.load against the incremental reader on a large product catalog.
+
+Each mode runs in its own process, parses the catalog, cleans every record and
+hands it to BATCH_SIZE batches (discarded, so only parsing is measured).
+Run from the repo root:
+
+    python -m benchmarks.bench_product_json --products 3000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_chunked_sales import peak_rss_mb
+
+
+def write_catalog(path, products, categories=20):
+    """Writes a product_info-style JSON array without building it in memory."""
+    with open(path, 'w') as f:
+        f.write('[\n')
+        for i in range(1, products + 1):
+            record = {'product_id': f"P{i:07}", 'product_name': f"Product {i}", 'category': f"Category {i % categories}"}
+            f.write(('    ' if i == 1 else ',\n    ') + json.dumps(record))
+        f.write('\n]\n')
+
+def run_child(path, mode):
+    from data_ingestion.process_data_to_silver import BATCH_SIZE, clean_data
+    from data_ingestion.readers import iter_json_array
+    started = time.perf_counter()
+    batches = 0
+    with open(path, 'r') as f:
+        records = json.load(f) if mode == 'json.load' else iter_json_array(f)
+        batch = []
+        for product in records:
+            batch.append(clean_data(product, 'product'))
+            if len(batch) >= BATCH_SIZE:
+                batches += 1
+                batch = []
+    print(json.dumps({'seconds': time.perf_counter() - started, 'peak_rss_mb': peak_rss_mb(), 'batches': batches}))
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=3_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'product_info.json')
+        write_catalog(path, args.products)
+        print(f"catalog: {args.products:,} products, {os.path.getsize(path) / 1e6:.0f} MB")
+        for mode in ('json.load', 'iter_json_array'):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_product_json', '--child', path, mode],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>16}: peak RSS {result['peak_rss_mb']:>8.0f} MB, {result['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Rows written and load time for daily catalog snapshots: rewriting every product against the hash diff.
+
+Generates --days full catalog snapshots in which --churn of the products are renamed or move category
+each day, --new products are added and --dropped are discontinued, then loads them into a fresh database
+with the previous loader (INSERT OR REPLACE of every product, which deletes and reinserts each row) and
+with process_data, which writes only new and changed products. Both include parsing and validation.
+Finally the snapshots are loaded newest first, one per run as the daemon may get them, and products and
+product_history are checked to match the load in date order. Run from the repo root:
+
+    python -m benchmarks.bench_product_snapshots --products 1000000 --days 10 --churn 0.01
+"""
+import argparse
+import datetime
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_ingestion.metrics import RunMetrics
+from data_ingestion.process_data_to_silver import _parse_file, process_data
+
+CATEGORIES = [f"Category {i}" for i in range(20)]
+
+
+def write_snapshots(data_dir, products, days, churn, new, seed=0, dropped=0.0):
+    """Writes one product_info_<date>.json per day, each a full catalog with some changed, new and dropped products."""
+    rng = np.random.default_rng(seed)
+    numbers = np.arange(1, products + 1)
+    catalog = pd.DataFrame({
+        'product_id': pd.Series(numbers).map("P{:07}".format),
+        'product_name': pd.Series(numbers).map("Product {}".format),
+        'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), products)],
+    })
+    next_id = products + 1
+    files = []
+    for day in range(days):
+        if day:
+            changed = rng.choice(len(catalog), int(len(catalog) * churn), replace=False)
+            renamed, moved = changed[::2], changed[1::2]
+            catalog.loc[renamed, 'product_name'] = catalog.loc[renamed, 'product_name'] + f" v{day}"
+            catalog.loc[moved, 'category'] = np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES),
+                                                                                              len(moved))]
+            # Numbered past every id issued so far, as dropped products leave gaps
+            added = np.arange(next_id, next_id + int(products * new))
+            next_id += len(added)
+            catalog = pd.concat([catalog, pd.DataFrame({
+                'product_id': pd.Series(added).map("P{:07}".format),
+                'product_name': pd.Series(added).map("Product {}".format),
+                'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), len(added))],
+            })], ignore_index=True)
+            discontinued = rng.choice(len(catalog), int(len(catalog) * dropped), replace=False)
+            catalog = catalog.drop(index=discontinued).reset_index(drop=True)
+        file = f"product_info_{datetime.date(2025, 1, 1) + datetime.timedelta(days=day)}.json"
+        catalog.to_json(os.path.join(data_dir, file), orient='records')
+        files.append(file)
+    return files
+
+def load_full_rewrite(data_dir, files, db_path):
+    """The previous product loader: INSERT OR REPLACE of every product in every snapshot."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE categories (category_id INTEGER PRIMARY KEY AUTOINCREMENT, category_name TEXT UNIQUE)")
+    conn.execute("CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, category_id INTEGER)")
+    written = 0
+    for file in files:
+        _, batches = _parse_file(os.path.join(data_dir, file), lazy=True)
+        for product_batch, _ in batches:
+            conn.executemany("INSERT OR IGNORE INTO categories (category_name) VALUES (?)",
+                             ((category,) for category in product_batch['category'].unique()))
+            category_ids = dict(conn.execute("SELECT category_name, category_id FROM categories"))
+            conn.executemany("INSERT OR REPLACE INTO products (product_id, product_name, category_id) VALUES (?, ?, ?)",
+                             zip(product_batch['product_id'].tolist(), product_batch['product_name'].tolist(),
+                                 product_batch['category'].map(category_ids).tolist()))
+            conn.commit()
+            written += len(product_batch)
+    conn.close()
+    return written
+
+def load_hash_diff(data_dir, files, db_path, bulk=None):
+    metrics = RunMetrics()
+    process_data(data_dir, db_path, files=files, bulk=bulk, metrics=metrics)
+    return metrics.stages['insert']['products_written']
+
+def catalog_state(db_path):
+    """products and product_history, with category names rather than ids (which depend on load order)."""
+    conn = sqlite3.connect(db_path)
+    products = sorted(conn.execute("SELECT product_id, product_name, category_name FROM products "
+                                   "JOIN categories USING (category_id)"))
+    history = sorted(conn.execute("SELECT product_id, product_name, category_name, valid_from, valid_to "
+                                  "FROM product_history JOIN categories USING (category_id)"))
+    conn.close()
+    return products, history
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=10, help="Daily catalog snapshots")
+    parser.add_argument('--churn', type=float, default=0.01, help="Fraction of products changed per day")
+    parser.add_argument('--new', type=float, default=0.001, help="Products added per day, as a fraction")
+    parser.add_argument('--dropped', type=float, default=0.0005, help="Products discontinued per day, as a fraction")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = write_snapshots(tmp, args.products, args.days, args.churn, args.new, dropped=args.dropped)
+        print(f"{args.days} snapshots of {args.products:,}+ products, {args.churn:.1%} changed per day")
+        for label, load in (("INSERT OR REPLACE all", load_full_rewrite),
+                            ("hash diff", load_hash_diff),
+                            ("hash diff, --bulk file", lambda *a: load_hash_diff(*a, bulk='file'))):
+            db_path = os.path.join(tmp, f"{len(os.listdir(tmp))}.db")
+            started = time.perf_counter()
+            written = load(tmp, files, db_path)
+            elapsed = time.perf_counter() - started
+            print(f"{label:>24}: {elapsed:>7.2f}s  {written:>12,} product rows written")
+        in_order = db_path
+
+        out_of_order = os.path.join(tmp, "newest_first.db")
+        started = time.perf_counter()
+        for file in reversed(files):
+            load_hash_diff(tmp, [file], out_of_order)
+        print(f"{'hash diff, newest first':>24}: {time.perf_counter() - started:>7.2f}s")
+        products, history = catalog_state(out_of_order)
+        assert (products, history) == catalog_state(in_order), "newest-first load differs from the in-order one"
+        print(f"  newest first matches the in-order load: {len(products):,} products, {len(history):,} versions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Time and memory of the previous timestamp-list rate limiter versus api.RateLimiter at 100k distinct clients.
+
+Each client sends a burst of requests; memory is measured with tracemalloc (in a separate, untimed pass)
+once all clients have been seen, and again after they have all gone idle for longer than the limiter's TTL. Run from the repo root:
+
+    python -m benchmarks.bench_rate_limiter --clients 100000 --requests 100
+"""
+import argparse
+import time
+import tracemalloc
+
+import api
+
+
+def legacy_rate_limiter(limit):
+    """The previous rate_limit: a list of timestamps per IP, rebuilt on every request and never evicted."""
+    request_counts = {}
+
+    def allow(ip_address, now):
+        if ip_address not in request_counts:
+            request_counts[ip_address] = []
+        requests = request_counts[ip_address]
+        requests = [r for r in requests if r > now - 60]
+        if len(requests) >= limit:
+            return False
+        requests.append(now)
+        request_counts[ip_address] = requests
+        return True
+    return allow, request_counts
+
+def drive(allow, clients, requests_per_client, clock):
+    """Sends requests_per_client requests from every client; returns (seconds, requests allowed)."""
+    allowed = 0
+    started = time.perf_counter()
+    for i in range(requests_per_client):
+        for client in clients:
+            allowed += allow(client)
+        clock[0] += 0.001
+    return time.perf_counter() - started, allowed
+
+def measure(label, make_allow, clients, requests_per_client, idle_ttl):
+    clock = [0.0]
+    allow, _ = make_allow(clock)
+    elapsed, allowed = drive(allow, clients, requests_per_client, clock)
+
+    # Memory on a fresh limiter, untimed since tracing slows every allocation down
+    clock = [0.0]
+    tracemalloc.start()
+    allow, state = make_allow(clock)
+    drive(allow, clients, requests_per_client, clock)
+    active_memory = tracemalloc.get_traced_memory()[0]
+    # Every client goes quiet past the TTL, then one new client arrives
+    clock[0] += idle_ttl + 1
+    allow("203.0.113.1")
+    idle_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    total = len(clients) * requests_per_client
+    print(f"{label:>14}: {total / elapsed:>10,.0f} checks/s  {elapsed / total * 1e6:5.2f} us/check  "
+          f"allowed {allowed:,}  memory {active_memory / 2**20:6.1f} MB active, "
+          f"{idle_memory / 2**20:6.1f} MB after idle ({len(state):,} clients tracked)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=100, help="Requests per client")
+    parser.add_argument('--limit', type=int, default=100, help="Requests per minute")
+    args = parser.parse_args()
+    clients = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.clients)]
+
+    def make_legacy(clock):
+        allow, request_counts = legacy_rate_limiter(args.limit)
+        return (lambda client: allow(client, clock[0])), request_counts
+
+    def make_bucket(clock):
+        limiter = api.RateLimiter(clock=lambda: clock[0])
+        return (lambda client: limiter.allow(client, args.limit)), limiter
+
+    measure("timestamp list", make_legacy, clients, args.requests, api.RATE_LIMIT_IDLE_TTL)
+    measure("token bucket", make_bucket, clients, args.requests, api.RATE_LIMIT_IDLE_TTL)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Rows/sec of the per-row iterrows sales load against the columnar path.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_sales_load --rows 2000000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_ingestion.process_data_to_silver import BATCH_SIZE, _lookup_product_categories, _sales_columns
+from data_ingestion.validation import SALE_SCHEMA, validate_frame
+
+INSERT_SALE = "INSERT INTO sales (product_id, sale_date, quantity, price, category_id) VALUES (?, ?, ?, ?, ?)"
+
+
+def write_sales_csv(path, rows, products, seed=0):
+    """Writes a synthetic sales file; about 1% of rows reference unknown products."""
+    rng = np.random.default_rng(seed)
+    product_numbers = rng.integers(1, int(products * 1.01) + 1, rows)
+    dates = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+    pd.DataFrame({
+        'product_id': pd.Series(product_numbers).map("P{:06}".format),
+        'sale_date': dates.strftime('%Y-%m-%d'),
+        'quantity': rng.integers(1, 11, rows),
+        'price': rng.uniform(10, 100, rows).round(2),
+    }).to_csv(path, index=False)
+
+def create_db(products):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, category_id INTEGER)")
+    conn.execute("CREATE TABLE sales (sale_id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, sale_date TEXT, "
+                 "quantity INTEGER, price REAL, category_id INTEGER)")
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?)",
+                     ((f"P{i:06}", f"Product {i}", i % 4 + 1) for i in range(1, products + 1)))
+    conn.commit()
+    return conn
+
+def load_iterrows(conn, df_sales):
+    """The previous loader: per-row iterrows() and dict lookups."""
+    cursor = conn.cursor()
+    product_to_category = {}
+    _lookup_product_categories(cursor, df_sales['product_id'].unique(), product_to_category)
+    for i in range(0, len(df_sales), BATCH_SIZE):
+        sale_records = []
+        for _, row in df_sales.iloc[i:i+BATCH_SIZE].iterrows():
+            row_dict = row.to_dict()
+            product_id = row_dict.get('product_id')
+            if product_to_category.get(product_id) is not None:
+                sale_records.append((product_id, row_dict.get('sale_date'), row_dict.get('quantity', 0),
+                                     row_dict.get('price', 0.0), product_to_category[product_id]))
+        if sale_records:
+            cursor.executemany(INSERT_SALE, sale_records)
+            conn.commit()
+
+def load_columnar(conn, df_sales):
+    """The current loader: one map over the frame, executemany fed from the column lists."""
+    cursor = conn.cursor()
+    product_to_category = {}
+    _lookup_product_categories(cursor, df_sales['product_id'].unique(), product_to_category)
+    sale_columns, _ = _sales_columns(df_sales, product_to_category)
+    for i in range(0, len(sale_columns[0]), BATCH_SIZE):
+        cursor.executemany(INSERT_SALE, zip(*(column[i:i+BATCH_SIZE] for column in sale_columns)))
+        conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "sales.csv")
+        write_sales_csv(csv_path, args.rows, args.products)
+        df_sales, _ = validate_frame(pd.read_csv(csv_path), SALE_SCHEMA)
+
+    results = {}
+    for name, loader in (("iterrows", load_iterrows), ("columnar", load_columnar)):
+        conn = create_db(args.products)
+        started = time.perf_counter()
+        loader(conn, df_sales.copy())
+        elapsed = time.perf_counter() - started
+        results[name] = conn.execute("SELECT product_id, sale_date, quantity, price, category_id FROM sales "
+                                     "ORDER BY sale_id").fetchall()
+        conn.close()
+        print(f"{name:>10}: {args.rows / elapsed:>12,.0f} rows/sec ({elapsed:.2f}s)")
+
+    print("outputs identical:", results["iterrows"] == results["columnar"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Wall-clock comparison of sequential and pooled parallel SFTP downloads.
+
+Generate data and start the local stand-in first:
+
+    python sftp_setup/generate_test_data.py
+    python sftp_setup/start_sftp.py --latency-ms 20
+
+(on loopback there is no round-trip latency to hide, so --latency-ms stands in
+for a remote link), then run from the repo root:
+
+    python -m benchmarks.bench_sftp_download --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+
+from data_ingestion import ingest_to_bronze
+
+
+def time_ingest(workers):
+    """Runs a full (cold manifest) ingest into a scratch dir and returns (files, seconds)."""
+    local_dir = tempfile.mkdtemp(prefix="bench_sftp_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            files = ingest_to_bronze.ingest(local_dir, workers=workers)
+            elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+    return len(files), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--host', default=ingest_to_bronze.SFTP_HOST)
+    parser.add_argument('--port', type=int, default=ingest_to_bronze.SFTP_PORT)
+    parser.add_argument('--remote-dir', default=ingest_to_bronze.SFTP_REMOTE_DIR)
+    args = parser.parse_args()
+
+    ingest_to_bronze.SFTP_HOST = args.host
+    ingest_to_bronze.SFTP_PORT = args.port
+    ingest_to_bronze.SFTP_REMOTE_DIR = args.remote_dir
+
+    baseline = None
+    print(f"{'workers':>8} {'files':>8} {'seconds':>10} {'speedup':>8}")
+    for workers in args.workers:
+        file_count, elapsed = time_ingest(workers)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {file_count:>8} {elapsed:>10.2f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
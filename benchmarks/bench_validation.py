@@ -0,0 +1,85 @@
+"""Rows/sec of per-record clean_data against schema validation of whole batches, on dirty synthetic data.
+
+Generates a sales file and a product catalog with --dirty malformed values, then times cleaning them
+record by record with clean_data (which coerces bad values to 0/None) and with validate_frame (which
+rejects them with a reason). Parsing is not timed. First checks that a product field's values pass or fail
+the same alone as in a batch of numbers or of text. Run from the repo root:
+
+    python -m benchmarks.bench_validation --rows 1000000 --dirty 0.05
+"""
+import argparse
+import contextlib
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from data_ingestion.process_data_to_silver import clean_data
+from data_ingestion.validation import PRODUCT_SCHEMA, SALE_SCHEMA, validate_frame
+from sftp_setup.generate_test_data import generate_product_info, generate_sales_data
+
+
+def timed(f, *args):
+    started = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - started
+
+def clean_records(records, data_type):
+    return [clean_data(record, data_type) for record in records]
+
+def coerced_sales(records):
+    """How many records clean_data kept with a value replaced by 0 or None."""
+    return sum(1 for r in records if r['sale_date'] is None or r['quantity'] == 0 or r['price'] == 0.0)
+
+def check_mixed_batches():
+    """Checks sample product_id values validate the same alone as next to numbers or text."""
+    schema = {'product_id': PRODUCT_SCHEMA['product_id']}
+    for value in (42, 42.0, 42.5, 'P42', ' ', None, float('nan'), True, float('inf')):
+        results = set()
+        for batch in ([value], [value, 7], [value, 7.0, None], [value, 'P7']):
+            valid, rejected = validate_frame(pd.DataFrame({'product_id': batch}), schema)
+            results.add((tuple(valid['product_id'][valid.index == 0]), tuple(rejected['reason'][rejected.index == 0])))
+        assert len(results) == 1, f"{value!r} validates differently depending on its batch: {results}"
+    print("product_id values validate the same in mixed and uniform batches")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Sales rows")
+    parser.add_argument('--products', type=int, default=200_000)
+    parser.add_argument('--dirty', type=float, default=0.05, help="Fraction of rows with a malformed value")
+    args = parser.parse_args()
+    check_mixed_batches()
+
+    date = datetime.date(2025, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        sales_path = os.path.join(tmp, generate_sales_data(date, args.rows, args.products, dirty=args.dirty,
+                                                           seed=0, data_dir=tmp))
+        products_path = os.path.join(tmp, generate_product_info(date, args.products, dirty=args.dirty, seed=1,
+                                                                data_dir=tmp))
+        with open(sales_path, newline='') as f:
+            sale_records = list(csv.DictReader(f))
+        df_sales = pd.read_csv(sales_path)
+        with open(products_path) as f:
+            product_records = json.load(f)
+
+    for label, records, data_type, schema in (("sales", sale_records, 'sale', SALE_SCHEMA),
+                                              ("products", product_records, 'product', PRODUCT_SCHEMA)):
+        # Building the product DataFrame is part of parsing, as read_csv is for sales, so it is not timed
+        frame = df_sales if data_type == 'sale' else pd.DataFrame(records)
+        (valid, rejected), vector_s = timed(validate_frame, frame, schema)
+        cleaned, record_s = timed(clean_records, [dict(r) for r in records], data_type)
+        print(f"{label} ({len(records):,} rows)")
+        print(f"  {'clean_data':>14}: {len(records) / record_s:>12,.0f} rows/sec ({record_s:.2f}s)")
+        print(f"  {'validate_frame':>14}: {len(records) / vector_s:>12,.0f} rows/sec ({vector_s:.2f}s)")
+        if data_type == 'sale':
+            print(f"  clean_data kept {coerced_sales(cleaned):,} rows with a value coerced to 0 or None")
+        print(f"  validate_frame rejected {len(rejected):,} rows:",
+              ', '.join(f"{reason} {count:,}" for reason, count in rejected['reason'].value_counts().items()))
+
+if __name__ == "__main__":
+    main()
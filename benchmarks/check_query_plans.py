@@ -0,0 +1,75 @@
+"""EXPLAIN QUERY PLAN regression check for /sales/filtered.
+
+Builds a small database with process_data, compiles every supported filter combination with
+api.filtered_sales_query (first page and a cursor page) and exits non-zero if any plan falls back
+to a full scan of sales. Run from the repo root:
+
+    python -m benchmarks.check_query_plans
+"""
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+import tempfile
+
+import api
+from benchmarks.bench_api_connections import build_benchmark_db
+
+SAMPLE_FILTERS = {
+    'date': '2025-04-02',
+    'start_date': '2025-04-01',
+    'end_date': '2025-04-30',
+    'product_id': 'P000042',
+    'category': '1',
+}
+
+
+def filter_combinations():
+    """Every non-empty combination of the supported filters."""
+    names = list(SAMPLE_FILTERS)
+    for size in range(1, len(names) + 1):
+        for combo in itertools.combinations(names, size):
+            yield {name: SAMPLE_FILTERS[name] for name in combo}
+
+
+def full_scans(conn, filters):
+    """Returns the plan lines that scan the whole sales table, for the first page and a cursor page."""
+    query, params, key_columns, _ = api.filtered_sales_query(filters)
+    scans = []
+    for last_key in (None, [SAMPLE_FILTERS['start_date'], 1][-len(key_columns):]):
+        page_query, page_params = api.paginate_query(query, params, key_columns, 10, last_key)
+        for row in conn.execute("EXPLAIN QUERY PLAN " + page_query, page_params):
+            detail = row[-1]
+            if detail.startswith("SCAN sales"):
+                scans.append(detail)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="check an existing database instead of building one")
+    parser.add_argument("--compact-schema", action="store_true", help="build the database with the compact schema")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if not db_path:
+            db_path = os.path.join(tmp, 'plans.db')
+            build_benchmark_db(db_path, files=2, rows=2_000, products=500, compact=args.compact_schema)
+        api.DB_PATH = db_path  # filtered_sales_query reads the sales layout from it
+        conn = sqlite3.connect(db_path)
+        failures = 0
+        for filters in filter_combinations():
+            scans = full_scans(conn, filters)
+            status = "FAIL" if scans else "ok"
+            print(f"{status:4} {', '.join(sorted(filters))}" + (f"  ({'; '.join(scans)})" if scans else ""))
+            failures += bool(scans)
+        conn.close()
+
+    print(f"{failures} filter combinations fall back to a full scan of sales")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""End-to-end benchmark suite: generate, ingest over SFTP, process_data and API latency at several data sizes.
+
+For each size, data is generated with sftp_setup/generate_test_data.py, served by a local sftp_setup/start_sftp.py
+on a free port, downloaded with ingest, loaded with process_data, and each API endpoint is timed (with the
+response cache disabled, so every request runs its query). Results are written as JSON for comparison across
+runs. Run from the repo root:
+
+    python -m benchmarks.run_benchmarks --sizes small medium --output results.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import api
+from data_ingestion import ingest_to_bronze
+from data_ingestion.process_data_to_silver import process_data
+from sftp_setup.generate_test_data import generate_data_files
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = {
+    'small': {'products': 1_000, 'days': 10, 'sales_per_file': 10_000},
+    'medium': {'products': 10_000, 'days': 30, 'sales_per_file': 100_000},
+    'large': {'products': 100_000, 'days': 60, 'sales_per_file': 500_000},
+    'xlarge': {'products': 1_000_000, 'days': 365, 'sales_per_file': 1_000_000},
+}
+
+API_ENDPOINTS = [
+    "/products?limit=100",
+    "/sales?limit=100",
+    "/categories",
+    "/sales/daily_count?limit=100",
+    "/sales/product_daily_count?limit=100",
+    "/sales/category_sales",
+    "/sales/filtered?product_id=P001&limit=100",
+    "/sales/filtered?start_date={start_date}&end_date={end_date}&limit=100",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def sftp_server(root_dir, port):
+    """Runs sftp_setup/start_sftp.py serving root_dir on port for the duration of the block."""
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'sftp_setup', 'start_sftp.py'), '-p', str(port), '-l', 'WARNING'],
+        cwd=root_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("SFTP server did not start")
+                time.sleep(0.1)
+        yield
+    finally:
+        server.terminate()
+        server.wait()
+
+def time_api(db_path, requests_per_endpoint, start_date, end_date):
+    """Returns {endpoint: latency stats} from the Flask test client, response cache off."""
+    api.DB_PATH = db_path
+    api.API_RATE_LIMIT = float('inf')
+    api.API_CACHE_SIZE = 0
+    api.clear_connection_pool()
+    client = api.app.test_client()
+    results = {}
+    for endpoint in API_ENDPOINTS:
+        url = endpoint.format(start_date=start_date, end_date=end_date)
+        latencies = []
+        for _ in range(requests_per_endpoint):
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        latencies.sort()
+        results[endpoint] = {
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p99_ms': round(latencies[max(int(len(latencies) * 0.99) - 1, 0)], 3),
+            'requests_per_s': round(len(latencies) / (sum(latencies) / 1000), 1),
+        }
+    return results
+
+def run_size(name, params, args):
+    """Runs every stage for one data size and returns its results."""
+    result = {'params': params}
+    with tempfile.TemporaryDirectory() as tmp:
+        remote_dir, local_dir = os.path.join(tmp, 'remote'), os.path.join(tmp, 'data')
+        db_path = os.path.join(tmp, 'bench.db')
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_data_files(params['days'], num_products=params['products'],
+                                sales_per_file=params['sales_per_file'], product_days=1, dirty=args.dirty,
+                                workers=args.workers, data_dir=remote_dir)
+        result['generate_s'] = round(time.perf_counter() - started, 3)
+        result['input_mb'] = round(sum(os.path.getsize(os.path.join(remote_dir, f))
+                                       for f in os.listdir(remote_dir)) / 2**20, 1)
+
+        port = free_port()
+        ingest_to_bronze.SFTP_HOST, ingest_to_bronze.SFTP_PORT = '127.0.0.1', port
+        ingest_to_bronze.SFTP_REMOTE_DIR = 'remote'
+        with sftp_server(tmp, port), contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            files = ingest_to_bronze.ingest(local_dir, workers=args.download_workers)
+            result['ingest_s'] = round(time.perf_counter() - started, 3)
+        result['ingest_mb_per_s'] = round(result['input_mb'] / max(result['ingest_s'], 1e-9), 1)
+
+        started = time.perf_counter()
+        process_data(local_dir, db_path, files=files, workers=args.process_workers)
+        result['process_s'] = round(time.perf_counter() - started, 3)
+        conn = sqlite3.connect(db_path)
+        sales_rows, start_date, end_date = conn.execute(
+            "SELECT COUNT(*), MIN(sale_date), MAX(sale_date) FROM sales").fetchone()
+        conn.close()
+        result['sales_rows'] = sales_rows
+        result['process_rows_per_s'] = round(sales_rows / max(result['process_s'], 1e-9))
+        result['db_mb'] = round(os.path.getsize(db_path) / 2**20, 1)
+
+        result['api'] = time_api(db_path, args.api_requests, start_date, end_date)
+    print(f"{name}: {sales_rows:,} sales rows, generate {result['generate_s']}s, ingest {result['ingest_s']}s, "
+          f"process {result['process_s']}s ({result['process_rows_per_s']:,} rows/s)")
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+    parser.add_argument('--dirty', type=float, default=0.0, help="Fraction of malformed rows in generated data")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Data generator processes")
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--process-workers', type=int, default=1)
+    parser.add_argument('--api-requests', type=int, default=200, help="Requests per API endpoint")
+    parser.add_argument('--output', default=None,
+                        help="JSON results file (default: benchmark-results-<UTC timestamp>.json)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    results = {
+        'started_at': now.isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'cpu_count': os.cpu_count(),
+        'options': {k: v for k, v in vars(args).items() if k != 'output'},
+        'sizes': {name: run_size(name, SIZES[name], args) for name in args.sizes},
+    }
+
+    output = args.output or f"benchmark-results-{now:%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
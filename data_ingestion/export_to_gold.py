@@ -0,0 +1,138 @@
+import os
+import shutil
+import sqlite3
+import logging
+import pandas as pd
+
+from data_ingestion.process_data_to_silver import uses_compact_schema, COMPACT_SALES_SQL, SALE_DAY_PARAM
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # The Parquet gold layer is optional
+    pa = ds = pq = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PARQUET_AVAILABLE = pa is not None
+PARTITION_FILE = "part-0.parquet"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"  # Hive's name for a NULL partition value, understood by pyarrow
+
+# Sales joined with product and category; sale_date is not stored in the files, it is the partition directory
+GOLD_QUERY = """
+    SELECT s.sale_id, s.product_id, p.product_name, s.category_id, c.category_name,
+           s.quantity, s.price, s.quantity * s.price AS revenue
+    FROM sales s
+    LEFT JOIN products p ON p.product_id = s.product_id
+    LEFT JOIN categories c ON c.category_id = s.category_id
+"""
+# The same from the compact sales layout, whose rows hold a product_key and a day number
+COMPACT_GOLD_QUERY = """
+    SELECT s.sale_id, k.product_id, p.product_name, s.category_id, c.category_name,
+           s.quantity, s.price, s.quantity * s.price AS revenue
+    FROM sales s
+    LEFT JOIN product_keys k ON k.product_key = s.product_key
+    LEFT JOIN products p ON p.product_id = k.product_id
+    LEFT JOIN categories c ON c.category_id = s.category_id
+"""
+GOLD_SCHEMA = pa.schema([
+    ('sale_id', pa.int64()),
+    ('product_id', pa.string()),
+    ('product_name', pa.string()),
+    ('category_id', pa.int64()),
+    ('category_name', pa.string()),
+    ('quantity', pa.int64()),
+    ('price', pa.float64()),
+    ('revenue', pa.float64()),
+]) if PARQUET_AVAILABLE else None
+
+
+def _require_pyarrow():
+    if not PARQUET_AVAILABLE:
+        raise ImportError("The Parquet gold layer needs pyarrow: pip install pyarrow")
+
+def _partition_dir(gold_dir, sale_date):
+    return os.path.join(gold_dir, f"sale_date={NULL_PARTITION if sale_date is None else sale_date}")
+
+def _existing_partitions(gold_dir):
+    """Returns the sale dates that currently have a partition directory."""
+    dates = set()
+    for name in os.listdir(gold_dir):
+        if name.startswith("sale_date="):
+            value = name[len("sale_date="):]
+            dates.add(None if value == NULL_PARTITION else value)
+    return dates
+
+def _write_partition(conn, gold_dir, sale_date):
+    """Rewrites one sale_date partition from SQLite, or removes it if the date no longer has sales; returns rows written."""
+    if uses_compact_schema(conn.cursor()):
+        query, date_column, date_param = COMPACT_GOLD_QUERY, "s.sale_day", SALE_DAY_PARAM
+    else:
+        query, date_column, date_param = GOLD_QUERY, "s.sale_date", "?"
+    if sale_date is None:
+        df = pd.read_sql_query(f"{query} WHERE {date_column} IS NULL ORDER BY s.sale_id", conn)
+    else:
+        df = pd.read_sql_query(f"{query} WHERE {date_column} = {date_param} ORDER BY s.sale_id", conn,
+                               params=(sale_date,))
+
+    partition_dir = _partition_dir(gold_dir, sale_date)
+    if df.empty:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+        return 0
+
+    os.makedirs(partition_dir, exist_ok=True)
+    # Written under a hidden name (ignored by dataset readers) and renamed, so readers never see half a file
+    tmp_path = os.path.join(partition_dir, f".{PARTITION_FILE}.tmp")
+    pq.write_table(pa.Table.from_pandas(df, schema=GOLD_SCHEMA, preserve_index=False), tmp_path)
+    os.replace(tmp_path, os.path.join(partition_dir, PARTITION_FILE))
+    return len(df)
+
+def write_gold(db_path, gold_dir, sale_dates=None):
+    """Writes sales joined with products and categories to Parquet under gold_dir, one partition per sale_date.
+
+    With sale_dates (e.g. the summary process_data returns) only those partitions are rewritten; without it,
+    or if gold_dir does not exist yet, every partition is rebuilt and ones without sales are removed.
+    """
+    _require_pyarrow()
+    conn = sqlite3.connect(db_path)
+    full_rebuild = sale_dates is None or not os.path.isdir(gold_dir)
+    os.makedirs(gold_dir, exist_ok=True)
+
+    if full_rebuild:
+        sale_date = COMPACT_SALES_SQL['sale_date'] if uses_compact_schema(conn.cursor()) else "sale_date"
+        current_dates = {row[0] for row in conn.execute(f"SELECT DISTINCT {sale_date} FROM sales")}
+        sale_dates = current_dates | _existing_partitions(gold_dir)
+        logging.info(f"Rebuilding the Parquet gold layer: {len(current_dates)} sale_date partitions")
+    else:
+        logging.info(f"Updating {len(sale_dates)} sale_date partitions of the Parquet gold layer")
+
+    total_rows = 0
+    for sale_date in sale_dates:
+        total_rows += _write_partition(conn, gold_dir, sale_date)
+    conn.close()
+    logging.info(f"Wrote {total_rows} rows to {gold_dir}")
+    return total_rows
+
+def gold_dataset(gold_dir):
+    """Opens the gold layer as a pyarrow dataset with sale_date as a string partition column."""
+    _require_pyarrow()
+    partitioning = ds.partitioning(pa.schema([('sale_date', pa.string())]), flavor='hive')
+    return ds.dataset(gold_dir, format='parquet', partitioning=partitioning)
+
+def query_gold(gold_dir, columns=None, start_date=None, end_date=None):
+    """Reads the gold layer into a DataFrame.
+
+    Only partitions with start_date <= sale_date <= end_date are opened (partition pruning) and only the
+    requested columns are read from them (column projection). sale_date can be requested like any column.
+    """
+    expression = None
+    if start_date is not None:
+        expression = ds.field('sale_date') >= start_date
+    if end_date is not None:
+        upper = ds.field('sale_date') <= end_date
+        expression = upper if expression is None else expression & upper
+    return gold_dataset(gold_dir).to_table(columns=columns, filter=expression).to_pandas()
+
+__all__ = ['write_gold', 'query_gold', 'gold_dataset', 'PARQUET_AVAILABLE']
@@ -1,16 +1,31 @@
 # data_pipeline.py
 import os
+import json
+import time
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import paramiko
 
+from data_ingestion.readers import file_checksum
+from data_ingestion.metrics import RunMetrics
 
 
-SFTP_HOST = "localhost"  
+SFTP_HOST = "localhost"
 SFTP_PORT = 22
 SFTP_USER = "demo"
 SFTP_PASS = "password"
 SFTP_REMOTE_DIR = "sftp_setup/fake_sftp_data"
 
+MANIFEST_FILE = ".manifest.json"  # Lives in the local data dir, hidden from process_data
+PARTIAL_SUFFIX = ".part"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_WORKERS = 4  # Parallel mode: worker threads, one pooled SFTP session each by default
+DOWNLOAD_RETRIES = 3
+RETRY_BACKOFF = 1.0  # Seconds, doubled on every retry
+MANIFEST_SAVE_INTERVAL = 5.0  # Seconds between manifest checkpoints during a download run
+
 
 def connect_sftp():
     try:
@@ -22,25 +37,289 @@ def connect_sftp():
         print(f"Error connecting to SFTP: {e}")
         return None, None
 
+def load_manifest(local_dir):
+    """Loads the manifest of downloaded files, keyed by file name."""
+    manifest_path = os.path.join(local_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(local_dir, manifest):
+    """Writes the manifest to a temp file and renames it into place."""
+    os.makedirs(local_dir, exist_ok=True)
+    manifest_path = os.path.join(local_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + PARTIAL_SUFFIX
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def pending_files(local_dir):
+    """Returns the downloaded files that process_data has not picked up yet."""
+    manifest = load_manifest(local_dir)
+    return sorted(file for file, entry in manifest.items() if not entry.get('processed'))
+
+def mark_processed(local_dir, files):
+    """Flags files in the manifest as loaded so the next run skips them."""
+    manifest = load_manifest(local_dir)
+    for file in files:
+        if file in manifest:
+            manifest[file]['processed'] = True
+    save_manifest(local_dir, manifest)
+
+def _is_changed(attr, entry):
+    """A remote file needs fetching when it is new or its size/mtime moved."""
+    if entry is None:
+        return True
+    return entry.get('size') != attr.st_size or entry.get('mtime') != attr.st_mtime
+
+def _partial_path(local_dir, attr):
+    # Size and mtime are part of the name so a partial is only resumed
+    # against the exact remote version it was started from.
+    return os.path.join(local_dir, f".{attr.filename}.{attr.st_size}-{attr.st_mtime}{PARTIAL_SUFFIX}")
+
+def download_file(sftp, remote_dir, local_dir, attr):
+    """Downloads one remote file, resuming a partial transfer if present, and returns its manifest entry."""
+    remote_path = f"{remote_dir}/{attr.filename}"
+    local_path = os.path.join(local_dir, attr.filename)
+    partial_path = _partial_path(local_dir, attr)
+
+    offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+    if offset > attr.st_size:
+        offset = 0
+
+    with sftp.open(remote_path, 'rb') as remote_file, open(partial_path, 'ab' if offset else 'wb') as local_file:
+        remote_file.seek(offset)
+        remote_file.prefetch(attr.st_size)
+        shutil.copyfileobj(remote_file, local_file, DOWNLOAD_CHUNK_SIZE)
+
+    downloaded_size = os.path.getsize(partial_path)
+    if downloaded_size != attr.st_size:
+        raise IOError(f"Incomplete download of {attr.filename}: {downloaded_size}/{attr.st_size} bytes")
+
+    checksum = file_checksum(partial_path)
+    os.replace(partial_path, local_path)
+    if offset:
+        print(f"Resumed {attr.filename} from byte {offset}")
+    return {
+        'size': attr.st_size,
+        'mtime': attr.st_mtime,
+        'checksum': checksum,
+        'downloaded_at': time.time(),
+        'processed': False,
+    }
+
+def _changed_files(sftp, remote_dir, manifest):
+    return [attr for attr in sftp.listdir_attr(remote_dir) if _is_changed(attr, manifest.get(attr.filename))]
+
+def _checkpoint_manifest(local_dir, manifest, last_saved):
+    """Saves the manifest if MANIFEST_SAVE_INTERVAL has passed; a crash only re-downloads files since the last save."""
+    now = time.time()
+    if now - last_saved < MANIFEST_SAVE_INTERVAL:
+        return last_saved
+    save_manifest(local_dir, manifest)
+    return now
+
+def _report_throughput(file_count, total_bytes, started):
+    elapsed = max(time.time() - started, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(f"Downloaded {file_count} files, {megabytes:.1f} MB in {elapsed:.2f}s "
+          f"({megabytes / elapsed:.2f} MB/s, {file_count / elapsed:.1f} files/s)")
+
 def download_sftp_files(sftp, remote_dir, local_dir):
+    """Downloads new or changed files and returns their names."""
+    downloaded = []
+    total_bytes = 0
+    started = last_saved = time.time()
+    manifest = None
     try:
-        files = sftp.listdir(remote_dir)
         os.makedirs(local_dir, exist_ok=True)
-        for file in files:
-            remote_path = f"{remote_dir}/{file}"
-            local_path = os.path.join(local_dir, file)
-            sftp.get(remote_path, local_path)
-            print(f"Downloaded: {file}")
+        manifest = load_manifest(local_dir)
+        remote_files = _changed_files(sftp, remote_dir, manifest)
+        print(f"{len(remote_files)} new or changed files to download")
+        for attr in remote_files:
+            manifest[attr.filename] = download_file(sftp, remote_dir, local_dir, attr)
+            downloaded.append(attr.filename)
+            total_bytes += attr.st_size
+            print(f"Downloaded: {attr.filename}")
+            last_saved = _checkpoint_manifest(local_dir, manifest, last_saved)
     except Exception as e:
         print(f"Error downloading files: {e}")
+    finally:
+        if downloaded:
+            save_manifest(local_dir, manifest)
+    _report_throughput(len(downloaded), total_bytes, started)
+    return downloaded
+
+def _open_session_pool(size):
+    """Opens up to size SFTP sessions, each on its own transport."""
+    pool = queue.Queue()
+    for _ in range(size):
+        sftp, transport = connect_sftp()
+        if sftp:
+            pool.put((sftp, transport))
+    return pool
 
-def ingest(data_dir):
+def _close_session(sftp, transport):
+    for conn in (sftp, transport):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _download_with_retry(pool, remote_dir, local_dir, attr, retries):
+    """Checks a session out of the pool and downloads one file, reconnecting between failed attempts."""
+    sftp, transport = pool.get()
+    try:
+        for attempt in range(1, retries + 1):
+            try:
+                if sftp is None:
+                    raise IOError("no SFTP session available")
+                return download_file(sftp, remote_dir, local_dir, attr)
+            except Exception as e:
+                print(f"Error downloading {attr.filename} (attempt {attempt}/{retries}): {e}")
+                if attempt == retries:
+                    raise
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+                # The session may be the culprit; the partial file survives and is resumed
+                if sftp is not None:
+                    _close_session(sftp, transport)
+                sftp, transport = connect_sftp()
+    finally:
+        pool.put((sftp, transport))
+
+def download_sftp_files_parallel(remote_dir, local_dir, workers=DOWNLOAD_WORKERS, sessions=None, retries=DOWNLOAD_RETRIES):
+    """Downloads new or changed files with a thread pool over pooled SFTP sessions and returns their names."""
+    pool = _open_session_pool(sessions or workers)
+    if pool.empty():
+        return []
+    print(f"Opened {pool.qsize()} SFTP sessions for {workers} download workers")
+
+    downloaded = []
+    total_bytes = 0
+    started = last_saved = time.time()
+    manifest = None
+    try:
+        os.makedirs(local_dir, exist_ok=True)
+        manifest = load_manifest(local_dir)
+        sftp, transport = pool.get()
+        try:
+            remote_files = _changed_files(sftp, remote_dir, manifest)
+        finally:
+            pool.put((sftp, transport))
+        print(f"{len(remote_files)} new or changed files to download")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_download_with_retry, pool, remote_dir, local_dir, attr, retries): attr
+                for attr in remote_files
+            }
+            # The manifest is only touched from this thread
+            for future in as_completed(futures):
+                attr = futures[future]
+                try:
+                    manifest[attr.filename] = future.result()
+                except Exception as e:
+                    print(f"Giving up on {attr.filename}: {e}")
+                    continue
+                downloaded.append(attr.filename)
+                total_bytes += attr.st_size
+                print(f"Downloaded: {attr.filename}")
+                last_saved = _checkpoint_manifest(local_dir, manifest, last_saved)
+    except Exception as e:
+        print(f"Error downloading files: {e}")
+    finally:
+        if downloaded:
+            save_manifest(local_dir, manifest)
+        while not pool.empty():
+            _close_session(*pool.get())
+    _report_throughput(len(downloaded), total_bytes, started)
+    return downloaded
+
+def stream_downloads(local_dir, manifest, workers=DOWNLOAD_WORKERS, retries=DOWNLOAD_RETRIES, order=None):
+    """Yields (file name, manifest entry) for each new or changed remote file as soon as it is downloaded.
+
+    Files are compared against manifest, but recording the entries is left to the caller, so it can hand
+    each file on (e.g. to a loader) while the rest are still downloading. With a sort key order(name), files
+    are downloaded and yielded in that order: a finished download is held until every file with a smaller
+    key has been yielded, while files with equal keys are yielded as they finish. Closing the generator early
+    cancels the queued downloads and waits for those in flight; they are fetched again on the next call.
+    """
+    pool = _open_session_pool(workers)
+    if pool.empty():
+        return
+    try:
+        os.makedirs(local_dir, exist_ok=True)
+        sftp, transport = pool.get()
+        try:
+            remote_files = _changed_files(sftp, SFTP_REMOTE_DIR, manifest)
+        finally:
+            pool.put((sftp, transport))
+        if order is not None:
+            remote_files.sort(key=lambda attr: order(attr.filename))
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(_download_with_retry, pool, SFTP_REMOTE_DIR, local_dir, attr, retries): attr
+                for attr in remote_files
+            }
+            queued = list(futures)  # In order; queued[next_pending] is the first not finished yet
+            next_pending = 0
+            finished = set()
+            held = []  # Finished downloads waiting on a file ordered before them
+            for future in as_completed(futures):
+                finished.add(future)
+                held.append(future)
+                while next_pending < len(queued) and queued[next_pending] in finished:
+                    next_pending += 1
+                if order is None or next_pending == len(queued):
+                    ready, held = held, []
+                else:
+                    bound = order(futures[queued[next_pending]].filename)
+                    ready = [done for done in held if order(futures[done].filename) <= bound]
+                    held = [done for done in held if order(futures[done].filename) > bound]
+                    ready.sort(key=lambda done: order(futures[done].filename))
+                for done in ready:
+                    attr = futures[done]
+                    try:
+                        entry = done.result()
+                    except Exception as e:
+                        print(f"Giving up on {attr.filename}: {e}")
+                        continue
+                    yield attr.filename, entry
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        while not pool.empty():
+            _close_session(*pool.get())
+
+def ingest(data_dir, workers=1, metrics=None):
+    """Downloads new or changed SFTP files into data_dir and returns their names.
+
+    With workers > 1 files are fetched in parallel over a pool of SFTP sessions.
+    The download stage (files, bytes, time) is recorded in metrics if given.
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    with metrics.timed('download'):
+        downloaded = _download(data_dir, workers)
+    metrics.record('download', files=len(downloaded),
+                   bytes=sum(os.path.getsize(os.path.join(data_dir, f)) for f in downloaded))
+    return downloaded
+
+def _download(data_dir, workers):
+    if workers > 1:
+        downloaded = download_sftp_files_parallel(SFTP_REMOTE_DIR, data_dir, workers=workers)
+        print('downloaded sftp files')
+        return downloaded
     sftp, transport = connect_sftp()
+    if not sftp:
+        return []
     print('connected to sftp server')
-    if sftp:
-        download_sftp_files(sftp, SFTP_REMOTE_DIR, data_dir)
-        print('downloaded sftp files')
-        sftp.close()
-        transport.close()
+    downloaded = download_sftp_files(sftp, SFTP_REMOTE_DIR, data_dir)
+    print('downloaded sftp files')
+    sftp.close()
+    transport.close()
+    return downloaded
 
-__all__ = ['ingest']
+__all__ = ['ingest', 'stream_downloads', 'pending_files', 'mark_processed']
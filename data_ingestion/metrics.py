@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import threading
+import datetime
+from contextlib import contextmanager
+
+# Stages of a pipeline run, in report order; anything else recorded is listed after them
+STAGES = ('download', 'parse', 'clean', 'insert', 'index', 'gold')
+
+
+class RunMetrics:
+    """Per-stage counters plus wall and CPU time for one pipeline run.
+
+    Stage times are exclusive: time spent in a stage timed inside another (e.g. parsing a lazily read
+    batch while inserting) counts only towards the inner one, so the stages add up to the run.
+    CPU time is process time, so it includes every thread but not worker processes; their times are
+    merged in from the workers' own RunMetrics with merge().
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, stage, **counters):
+        """Adds counters (e.g. files=1, rows=500, bytes=...) to stage."""
+        with self._lock:
+            totals = self.stages.setdefault(stage, {})
+            for name, value in counters.items():
+                totals[name] = totals.get(name, 0) + value
+
+    def record_max(self, stage, **values):
+        """Keeps the largest value seen for each of values (e.g. lag_max_s=12.5) in stage."""
+        with self._lock:
+            totals = self.stages.setdefault(stage, {})
+            for name, value in values.items():
+                totals[name] = max(totals.get(name, value), value)
+
+    def merge(self, stages):
+        """Adds the stages of another RunMetrics (e.g. from a worker process) into this one."""
+        for stage, counters in stages.items():
+            self.record(stage, **counters)
+
+    @contextmanager
+    def timed(self, stage):
+        """Times the block as stage, excluding any stages timed inside it."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        frame = {'wall': 0.0, 'cpu': 0.0}  # Time of nested stages
+        stack.append(frame)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stack.pop()
+            if stack:
+                stack[-1]['wall'] += wall
+                stack[-1]['cpu'] += cpu
+            self.record(stage, wall_s=wall - frame['wall'], cpu_s=cpu - frame['cpu'])
+
+    def timed_iter(self, stage, iterable):
+        """Yields from iterable, timing each step of it (e.g. reading the next chunk) as stage."""
+        iterator = iter(iterable)
+        while True:
+            with self.timed(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def report(self):
+        """Returns the run report as a JSON-serializable dict."""
+        with self._lock:
+            stages = {name: dict(counters) for name, counters in self.stages.items()}
+        ordered = [s for s in STAGES if s in stages] + sorted(s for s in stages if s not in STAGES)
+        for counters in stages.values():
+            if counters.get('rows') and counters.get('wall_s'):
+                counters['rows_per_s'] = round(counters['rows'] / counters['wall_s'])
+            for key in ('wall_s', 'cpu_s'):
+                if key in counters:
+                    counters[key] = round(counters[key], 4)
+        report = {
+            'started_at': datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+            'wall_s': round(time.perf_counter() - self._started, 4),
+            'cpu_s': round(time.process_time() - self._started_cpu, 4),
+            'stages': {name: stages[name] for name in ordered},
+        }
+        if 'parse' in stages and 'insert' in stages:
+            # Rows read but not inserted were quarantined in rejected_rows by validation
+            read, inserted = stages['parse'].get('rows', 0), stages['insert'].get('rows', 0)
+            report['rows'] = {'read': read, 'inserted': inserted, 'rejected': read - inserted}
+        return report
+
+    def write_report(self, path):
+        """Writes the run report as JSON to path, creating its directory."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+__all__ = ['RunMetrics', 'STAGES']
@@ -1,14 +1,94 @@
 import sqlite3
 import os
+import re
+import numpy as np
 import pandas as pd
-import json
 import datetime
 import logging
 import shutil
+import math
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from data_ingestion.readers import iter_json_array, file_checksum, open_input, split_compression, can_decompress
+from data_ingestion.metrics import RunMetrics
+from data_ingestion.validation import PRODUCT_SCHEMA, SALE_SCHEMA, validate_frame, rejected_records
 
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Process files in batches
+BATCH_SIZE = 1000  # Adjust based on your data size
+SALES_CHUNK_SIZE = 100000  # Rows per read_csv chunk in streaming mode
+PRODUCT_BATCH_SIZE = 50000  # Products parsed and validated per DataFrame; per-batch overhead dominates small ones
+
+# Composite indexes match the API's filter combinations (product or category, optionally with a date range),
+# and each is ordered by (sale_date, sale_id) within the equality column so filtered pages need no sort.
+SALES_INDEXES = {
+    'idx_sales_product_date': "CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales (product_id, sale_date)",
+    'idx_sales_category_date': "CREATE INDEX IF NOT EXISTS idx_sales_category_date ON sales (category_id, sale_date)",
+    'idx_sales_date': "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date)",
+    'idx_sales_source_file': "CREATE INDEX IF NOT EXISTS idx_sales_source_file ON sales (source_file)",
+}
+# Optional compact sales layout, chosen when a database is created: product_key (a surrogate key into
+# product_keys) and sale_day (days since 1970-01-01) in place of the product_id and sale_date text, so rows
+# and every idx_sales_* entry are narrower. The indexes keep their names and column order.
+COMPACT_SALES_INDEXES = {
+    'idx_sales_product_date': "CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales (product_key, sale_day)",
+    'idx_sales_category_date': "CREATE INDEX IF NOT EXISTS idx_sales_category_date ON sales (category_id, sale_day)",
+    'idx_sales_date': "CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_day)",
+    'idx_sales_source_file': "CREATE INDEX IF NOT EXISTS idx_sales_source_file ON sales (source_file)",
+}
+# SQL reading product_id and sale_date back from a row of compact sales (unaliased)
+COMPACT_SALES_SQL = {
+    'product_id': "(SELECT product_id FROM product_keys k WHERE k.product_key = sales.product_key)",
+    'sale_date': "date(sales.sale_day * 86400, 'unixepoch')",
+}
+SALE_DAY_EPOCH = datetime.date(1970, 1, 1)
+SALE_DAY_PARAM = "CAST(julianday(?) - 2440587.5 AS INTEGER)"  # A YYYY-MM-DD parameter as a sale_day
+# Superseded by the composite indexes above, dropped from existing databases
+OBSOLETE_SALES_INDEXES = ('idx_sales_product_id', 'idx_sales_category_id')
+BULK_MODES = ('file', 'run')  # Bulk load: commit once per file or once per run
+
+# Aggregates behind the API's GROUP BY endpoints, kept current in the same transaction as every sales write.
+# A NULL sale_date is stored as '' so it still has a single key.
+ROLLUP_TABLES = {
+    'sales_daily_rollup': """
+        CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+            sale_date TEXT PRIMARY KEY,
+            sale_count INTEGER NOT NULL
+        )
+    """,
+    'sales_product_daily_rollup': """
+        CREATE TABLE IF NOT EXISTS sales_product_daily_rollup (
+            sale_date TEXT,
+            product_id TEXT,
+            sale_count INTEGER NOT NULL,
+            PRIMARY KEY (sale_date, product_id)
+        )
+    """,
+    'sales_category_rollup': """
+        CREATE TABLE IF NOT EXISTS sales_category_rollup (
+            category_id INTEGER PRIMARY KEY,
+            total_sales REAL NOT NULL,
+            sale_count INTEGER NOT NULL
+        )
+    """,
+}
+
+# Covering indexes for the API's keyset pagination: each page is one seek on the page key
+# followed by an index-only scan, so page N costs the same as page 1.
+PAGINATION_INDEXES = {
+    'idx_sales_daily_rollup_page':
+        "CREATE INDEX IF NOT EXISTS idx_sales_daily_rollup_page ON sales_daily_rollup (sale_date, sale_count)",
+    'idx_sales_product_daily_rollup_page':
+        "CREATE INDEX IF NOT EXISTS idx_sales_product_daily_rollup_page "
+        "ON sales_product_daily_rollup (sale_date, product_id, sale_count)",
+    'idx_categories_name_page':
+        "CREATE INDEX IF NOT EXISTS idx_categories_name_page ON categories (category_name, category_id)",
+}
+
 def clean_data(data, data_type):
     """Performs basic data cleaning based on data type."""
     if data_type == 'product':
@@ -39,18 +119,52 @@ def clean_data(data, data_type):
         return data
     return data
 
-def process_data(local_dir, db_path):
-    """Processes downloaded data, stores sales and products in separate tables with batch processing for efficiency."""
+def process_data(local_dir, db_path, files=None, chunk_size=None, workers=1, bulk=None, replace=False, metrics=None,
+                 compact=False):
+    """Processes downloaded data, stores sales and products in separate tables with batch processing for efficiency.
+
+    When files is given (e.g. the new downloads listed in the ingest manifest) only those are processed.
+    With chunk_size set, sales CSVs are streamed chunk_size rows at a time so memory stays flat for any file size.
+    With workers > 1, files are parsed and cleaned in a process pool while this process writes them, all
+    product files (and so categories) first, then sales; workers return whole files, so not with chunk_size.
+    With bulk='file' or bulk='run' (for backfills), rows go into unindexed staging tables and are moved into
+    sales/products with one INSERT ... SELECT per file, committing once per file or once per run, and the
+    sales indexes are dropped for the duration of the load and rebuilt at the end (but idx_sales_source_file,
+    when files loaded before are being replaced).
+    Every loaded file is recorded in load_ledger with its content hash, and files already loaded unchanged are
+    skipped, so reruns are idempotent. A file that changed since it was loaded is skipped with a warning unless
+    replace=True, which deletes its previous sales rows and loads the new version in one transaction.
+    Returns a summary of the run for downstream stages: the files loaded, the changed files skipped for want of
+    replace, and the sale dates whose sales changed or include a product whose name or category changed
+    (None stands for sales without a date).
+    Per-stage counters and timings (parse, clean, insert, index) are recorded in metrics if given.
+    With compact=True a new database gets the compact sales layout (see COMPACT_SALES_INDEXES); an existing
+    database keeps the layout it was created with.
+    """
+    if bulk not in (None,) + BULK_MODES:
+        raise ValueError(f"bulk must be one of {BULK_MODES} or None, got {bulk!r}")
+    if chunk_size and workers > 1:
+        # Workers hand back each file whole, which would hold it in memory however small the chunks
+        raise ValueError("chunk_size streams sales files in this process and cannot be combined with workers > 1")
+    metrics = metrics if metrics is not None else RunMetrics()
     
     # Set up the database with optimized settings
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA journal_mode=WAL")  # Use Write-Ahead Logging for better concurrency
     conn.execute("PRAGMA synchronous=NORMAL")  # Reduce fsync calls for better performance
     conn.execute("PRAGMA cache_size=10000")  # Increase cache size
-    conn.execute("PRAGMA temp_store=MEMORY")  # Store temp tables in memory
+    # Store temp tables in memory, except when streaming: index builds then sort on disk instead of in RAM
+    conn.execute(f"PRAGMA temp_store={'FILE' if chunk_size else 'MEMORY'}")
     
     cursor = conn.cursor()
     
+    unledgered = _unledgered_sales(cursor)
+    if unledgered:
+        conn.close()
+        raise ValueError(f"{db_path} holds {unledgered:,} sales rows loaded before load_ledger recorded their "
+                         "source files, so their files would load again and the rows would be duplicated; "
+                         "move the database aside and reload every file into a new one")
+    
     # Create tables
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS categories (
@@ -68,6 +182,9 @@ def process_data(local_dir, db_path):
         )
     """)
 
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales')")
+    if compact and not cursor.fetchone()[0]:
+        _create_compact_sales(cursor)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS sales (
             sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,144 +193,827 @@ def process_data(local_dir, db_path):
             quantity INTEGER,
             price REAL,
             category_id INTEGER,
+            source_file TEXT,
             FOREIGN KEY (product_id) REFERENCES products (product_id),
             FOREIGN KEY (category_id) REFERENCES categories (category_id)
         )
     """)
+    if compact and not uses_compact_schema(cursor):
+        logging.warning(f"{db_path} was created with the text sales schema, which it keeps; "
+                        "the compact schema applies to new databases")
+    compact = uses_compact_schema(cursor)
+    # Databases created before sales rows were tagged with their file
+    _ensure_column(cursor, 'sales', 'source_file', 'TEXT')
+    # Hash of a product's name and category, so catalog snapshots only write the products that changed;
+    # NULL (e.g. rows written before it existed) always counts as changed
+    _ensure_column(cursor, 'products', 'content_hash', 'INTEGER')
+    
+    # Every version of every product, valid from the date of the snapshot that introduced it until
+    # the date of the one that changed it (valid_to is NULL for the current version)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_history (
+            product_id TEXT,
+            product_name TEXT,
+            category_id INTEGER,
+            valid_from TEXT,
+            valid_to TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_product_history_current ON product_history (product_id)
+        WHERE valid_to IS NULL
+    """)
+    # Snapshots loaded out of order look up the version in force on a date
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_product_history_product ON product_history (product_id, valid_from)")
+    
+    _create_rollup_tables(cursor)
+    for create_index in PAGINATION_INDEXES.values():
+        cursor.execute(create_index)
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS load_ledger (
+            file_name TEXT PRIMARY KEY,
+            content_hash TEXT,
+            status TEXT,
+            row_count INTEGER,
+            loaded_at TEXT
+        )
+    """)
+    
+    # Quarantine for rows that failed validation or reference an unknown product, kept as read
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rejected_rows (
+            rejected_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_file TEXT,
+            record_type TEXT,
+            reason TEXT,
+            record TEXT,
+            rejected_at TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rejected_rows_source_file ON rejected_rows (source_file)")
+    
+    if bulk:
+        _create_staging_tables(cursor)
     
     # Create category_name to ID mapping cache
     cursor.execute("SELECT category_id, category_name FROM categories")
     category_cache = {name: id for id, name in cursor.fetchall()}
     
+    # product_id -> category_id (None if unknown) for products seen in sales files, kept current by product loads
+    product_category_cache = {}
+    # product_id -> stored content_hash, read from the table by the first product load that needs it
+    product_hash_cache = {}
+    # product_id -> product_key (compact schema only) for products seen in sales files
+    product_key_cache = {} if compact else None
+    
     # Set up directory for unknown files
     unknown_files_dir = os.path.join(local_dir, "unknown_files")
     os.makedirs(unknown_files_dir, exist_ok=True)
     
-    # Process files in batches
-    BATCH_SIZE = 1000  # Adjust based on your data size
+    if files is None:
+        files = os.listdir(local_dir)
+    # Hidden files are ingest bookkeeping (manifest, partial downloads)
+    files = [f for f in files if not f.startswith('.') and os.path.isfile(os.path.join(local_dir, f))]
     
-    file_count = 0
-    total_files = len([f for f in os.listdir(local_dir) if os.path.isfile(os.path.join(local_dir, f))])
+    # Anything that is neither a product nor a sales file, or is compressed in a way this install cannot read,
+    # is set aside
+    for file in [f for f in files if _file_kind(f) is None or not can_decompress(f)]:
+        if _file_kind(file) is None:
+            logging.warning(f"Unknown file type: {file}. Moving to unknown_files directory.")
+        else:
+            logging.warning(f"Reading {file} requires the zstandard package. Moving to unknown_files directory.")
+        shutil.move(os.path.join(local_dir, file), os.path.join(unknown_files_dir, file))
+    files = [f for f in files if _file_kind(f) is not None and can_decompress(f)]
+    files = sorted(files, key=load_order)
     
-    for file in os.listdir(local_dir):
-        file_path = os.path.join(local_dir, file)
-        
-        if not os.path.isfile(file_path):
-            continue
-            
-        file_count += 1
+    # Check every file against the ledger before doing any parsing work
+    with metrics.timed('plan'):
+        load_plan, changed_files = _plan_loads(cursor, local_dir, files, replace)
+    files = list(load_plan)
+    
+    if bulk:
+        # Sales files loaded before (replaced, or interrupted) have their previous rows found by source_file,
+        # so that index is only dropped when there are none
+        reloading = any(status is not None and not is_product_file(file) for file, (_, status) in load_plan.items())
+        logging.info("Bulk load: dropping sales indexes until the load completes")
+        for index_name in SALES_INDEXES:
+            if not (reloading and index_name == 'idx_sales_source_file'):
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    
+    if workers > 1:
+        # Parse/clean in a process pool; this process stays the only writer
+        parsed_files = _parse_files_parallel(local_dir, files, workers, metrics)
+    else:
+        parsed_files = ((file, _parse_file(os.path.join(local_dir, file), chunk_size, lazy=True, metrics=metrics))
+                        for file in files)
+    
+    total_files = len(files)
+    touched_dates = set()
+    changed_products = set()  # product_ids whose name or category were written to products
+    for file_count, (file, (kind, batches)) in enumerate(parsed_files, start=1):
         logging.info(f"Processing file {file_count}/{total_files}: {file}")
+        content_hash, previous_status = load_plan[file]
+        metrics.record('parse', files=1, bytes=os.path.getsize(os.path.join(local_dir, file)))
         
-        if file.endswith(".json"):
-            # Process JSON product files
-            with open(file_path, 'r') as f:
-                products_data = json.load(f)
-                
-            # Prepare batches
-            product_batch = []
-            new_categories = set()
-            
-            for product in products_data:
-                cleaned_product = clean_data(product, 'product')
-                category = cleaned_product['category']
-                
-                # Track new categories
-                if category not in category_cache:
-                    new_categories.add(category)
-                
-                product_batch.append(cleaned_product)
-                
-                # Process batch if it reaches the batch size
-                if len(product_batch) >= BATCH_SIZE:
-                    _batch_process_products(conn, cursor, product_batch, category_cache, new_categories)
-                    product_batch = []
-                    new_categories = set()
-            
-            # Process remaining items
-            if product_batch:
-                _batch_process_products(conn, cursor, product_batch, category_cache, new_categories)
-                
-        elif file.endswith(".csv"):
-            # Process CSV sales files - use pandas efficiently
-            df_sales = pd.read_csv(file_path)
-            
-            # Clean data using vectorized operations where possible
-            if 'product_id' in df_sales.columns:
-                df_sales['product_id'] = df_sales['product_id'].astype(str)
+        # Parsing and cleaning of lazily read batches is timed as its own stages inside this one
+        with metrics.timed('insert'):
+            # A replacement is written in one transaction, like a bulk load of that file
+            replacing = previous_status == 'loaded'
+            staging = bool(bulk) or replacing
+            if staging:
+                _create_staging_tables(cursor)
+            _record_load(cursor, file, content_hash, 'loading')
+            if not staging:
+                conn.commit()
             
-            # Validate dates
-            if 'sale_date' in df_sales.columns:
-                df_sales['sale_date'] = pd.to_datetime(df_sales['sale_date'], errors='coerce').dt.strftime('%Y-%m-%d')
+            if previous_status is not None:
+                # Rejections from the version being replaced or the interrupted load
+                cursor.execute("DELETE FROM rejected_rows WHERE source_file = ?", (file,))
+            if kind == 'product':
+                row_count, rejected_count = _load_products(conn, cursor, batches, category_cache,
+                                                           product_category_cache, product_hash_cache,
+                                                           source_file=file, staging=staging, metrics=metrics,
+                                                           changed_products=changed_products)
+            else:
+                if previous_status is not None:
+                    # Rows from the version being replaced, or from a load that died partway through
+                    cursor.execute(f"SELECT DISTINCT {_sales_sql(cursor)['sale_date']} FROM sales "
+                                   "WHERE source_file = ?", (file,))
+                    touched_dates.update(row[0] for row in cursor.fetchall())
+                    _update_rollups(cursor, "source_file = ?", (file,), sign=-1)
+                    cursor.execute("DELETE FROM sales WHERE source_file = ?", (file,))
+                row_count, rejected_count = _load_sales(conn, cursor, batches, product_category_cache,
+                                                        source_file=file, staging=staging,
+                                                        touched_dates=touched_dates,
+                                                        product_key_cache=product_key_cache)
             
-            # Convert numeric columns
-            if 'quantity' in df_sales.columns:
-                df_sales['quantity'] = pd.to_numeric(df_sales['quantity'], errors='coerce').fillna(0).astype(int)
-            
-            if 'price' in df_sales.columns:
-                df_sales['price'] = pd.to_numeric(df_sales['price'], errors='coerce').fillna(0).astype(float)
-            
-            # Get category_ids for all product_ids at once
-            unique_product_ids = df_sales['product_id'].unique()
-            product_to_category = {}
-            
-            # Break into smaller chunks if there are many unique products
-            for i in range(0, len(unique_product_ids), 500):
-                chunk = unique_product_ids[i:i+500]
-                placeholders = ','.join(['?'] * len(chunk))
-                cursor.execute(f"SELECT product_id, category_id FROM products WHERE product_id IN ({placeholders})", chunk)
-                product_to_category.update(dict(cursor.fetchall()))
-            
-            # Process in batches
-            total_rows = len(df_sales)
-            for i in range(0, total_rows, BATCH_SIZE):
-                if i % (BATCH_SIZE * 10) == 0:
-                    logging.info(f"Processing sales batch {i}-{min(i+BATCH_SIZE, total_rows)} of {total_rows}")
-                
-                batch_df = df_sales.iloc[i:i+BATCH_SIZE]
-                sale_records = []
-                
-                for _, row in batch_df.iterrows():
-                    row_dict = row.to_dict()
-                    product_id = row_dict.get('product_id')
-                    
-                    if product_id in product_to_category:
-                        category_id = product_to_category[product_id]
-                        sale_records.append((
-                            product_id,
-                            row_dict.get('sale_date'),
-                            row_dict.get('quantity', 0),
-                            row_dict.get('price', 0.0),
-                            category_id
-                        ))
-                
-                if sale_records:
-                    cursor.executemany(
-                        "INSERT INTO sales (product_id, sale_date, quantity, price, category_id) VALUES (?, ?, ?, ?, ?)",
-                        sale_records
-                    )
-                    conn.commit()
-                
-        else:
-            logging.warning(f"Unknown file type: {file}. Moving to unknown_files directory.")
-            shutil.move(file_path, os.path.join(unknown_files_dir, file))
+            if staging:
+                _merge_staging_tables(cursor, metrics, valid_from=_snapshot_date(file),
+                                      changed_products=changed_products)
+                product_hash_cache.clear()  # Reread if needed: the merge wrote products without it
+            _record_load(cursor, file, content_hash, 'loaded', row_count)
+            if bulk != 'run':
+                conn.commit()
+        metrics.record('insert', files=1, rows=row_count)
+        if rejected_count:
+            logging.warning(f"Quarantined {rejected_count} rows of {file} in rejected_rows")
     
     # Final optimization: create indexes for faster queries
     logging.info("Creating indexes for better query performance...")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales (product_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_category_id ON sales (category_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date)")
-    
-    conn.commit()
+    with metrics.timed('index'):
+        for index_name in OBSOLETE_SALES_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        for create_index in (COMPACT_SALES_INDEXES if compact else SALES_INDEXES).values():
+            cursor.execute(create_index)
+        
+        if load_plan:
+            # Lets readers (e.g. the API response cache) tell that the data changed
+            _bump_data_version(cursor)
+        conn.commit()
+    # Sales of changed products now read differently joined with products, e.g. in the gold layer
+    touched_dates.update(_product_sale_dates(cursor, changed_products))
     conn.close()
     logging.info("Data processing completed successfully.")
+    return {
+        'loaded_files': files,
+        # Skipped because they changed since they were loaded; still to load with replace
+        'changed_files': changed_files,
+        'sale_dates': touched_dates,
+    }
+
+def _bump_data_version(cursor):
+    """Increments the data version stamp kept in the database header (PRAGMA user_version)."""
+    cursor.execute("PRAGMA user_version")
+    cursor.execute(f"PRAGMA user_version = {cursor.fetchone()[0] + 1}")
+
+def _create_compact_sales(cursor):
+    """Creates sales with the compact layout, and the product_keys dimension its product_key refers to."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_keys (
+            product_key INTEGER PRIMARY KEY,
+            product_id TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sales (
+            sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_key INTEGER,
+            sale_day INTEGER,
+            quantity INTEGER,
+            price REAL,
+            category_id INTEGER,
+            source_file TEXT,
+            FOREIGN KEY (product_key) REFERENCES product_keys (product_key),
+            FOREIGN KEY (category_id) REFERENCES categories (category_id)
+        )
+    """)
+
+def uses_compact_schema(cursor):
+    """Whether the database's sales table has the compact layout (product_key and sale_day)."""
+    return 'sale_day' in {row[1] for row in cursor.execute("PRAGMA table_info(sales)").fetchall()}
+
+def _sales_sql(cursor):
+    """SQL for product_id and sale_date on an unaliased sales row, plus the columns to group them by."""
+    if uses_compact_schema(cursor):
+        return dict(COMPACT_SALES_SQL, product_group='sales.product_key', date_group='sales.sale_day')
+    return {'product_id': 'product_id', 'sale_date': 'sale_date', 'product_group': 'product_id',
+            'date_group': 'sale_date'}
+
+def _sales_insert_columns(cursor):
+    if uses_compact_schema(cursor):
+        return ('product_key', 'sale_day', 'quantity', 'price', 'category_id', 'source_file')
+    return ('product_id', 'sale_date', 'quantity', 'price', 'category_id', 'source_file')
+
+def _unledgered_sales(cursor):
+    """Counts the sales rows of a database from before load_ledger, whose source files are unknown.
+
+    Only a database whose ledger is missing or empty is checked, since every load since then is recorded.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('sales', 'load_ledger')")
+    tables = {name for (name,) in cursor.fetchall()}
+    if 'sales' not in tables:
+        return 0
+    if 'load_ledger' in tables and cursor.execute("SELECT 1 FROM load_ledger LIMIT 1").fetchone():
+        return 0
+    cursor.execute("PRAGMA table_info(sales)")
+    if 'source_file' not in {row[1] for row in cursor.fetchall()}:
+        return cursor.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    return cursor.execute("SELECT COUNT(*) FROM sales WHERE source_file IS NULL").fetchone()[0]
+
+def _ensure_column(cursor, table, column, declaration):
+    """Adds a column to an existing table if it is missing."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def _plan_loads(cursor, local_dir, files, replace=False):
+    """Returns ({file: (content_hash, previous_status)}, changed_files) for the files that need loading, in file order.
+
+    Files already loaded with the same content are skipped, as are changed files unless replace is set;
+    those are returned as changed_files. previous_status is None for new files, 'loading' for an
+    interrupted load and 'loaded' for a replacement.
+    """
+    cursor.execute("SELECT file_name, content_hash, status FROM load_ledger")
+    ledger = {file: (content_hash, status) for file, content_hash, status in cursor.fetchall()}
+    
+    load_plan, changed_files = {}, []
+    for file in files:
+        content_hash = file_checksum(os.path.join(local_dir, file))
+        loaded_hash, status = ledger.get(file, (None, None))
+        if status == 'loaded' and loaded_hash == content_hash:
+            logging.info(f"Skipping {file}: already loaded")
+            continue
+        if status == 'loaded' and not replace:
+            logging.warning(f"Skipping {file}: changed since it was loaded; rerun with replace to reload it")
+            changed_files.append(file)
+            continue
+        load_plan[file] = (content_hash, status)
+    return load_plan, changed_files
+
+def _record_load(cursor, file, content_hash, status, row_count=None):
+    cursor.execute("""
+        INSERT OR REPLACE INTO load_ledger (file_name, content_hash, status, row_count, loaded_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (file, content_hash, status, row_count, datetime.datetime.now().isoformat(timespec='seconds')))
+
+def _file_kind(file):
+    """Returns 'product' or 'sales' for the input file types process_data understands, else None.
+
+    Files may be gzip (.gz) or zstd (.zst) compressed, e.g. sales_data_2025-06-01.csv.gz.
+    """
+    name, _ = split_compression(file)
+    if name.endswith(".json"):
+        return 'product'
+    if name.endswith(".csv"):
+        return 'sales'
+    return None
+
+def is_product_file(file):
+    """Product files load before sales files, whose rows are checked against the products."""
+    return _file_kind(file) == 'product'
+
+def load_order(file):
+    """Sort key for the order files load in.
+
+    Products first, since sales rows are checked against them, oldest snapshot first so each one closes the
+    product_history versions of the one before; sales files share one key and keep the order given.
+    """
+    return (False, _snapshot_date(file)) if is_product_file(file) else (True, '')
+
+def _parse_file(file_path, chunk_size=None, lazy=False, metrics=None):
+    """Parses and cleans one input file into (kind, batches) ready for _load_products/_load_sales.
 
-def _batch_process_products(conn, cursor, product_batch, category_cache, new_categories):
-    """Helper function to process product batches and update category cache."""
+    Every batch is a (valid, rejected) pair of DataFrames from validate_frame.
+    With lazy=True the batches are a generator, otherwise a list (so they can be sent between processes).
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    kind = _file_kind(file_path)
+    if kind == 'product':
+        batches = _iter_product_batches(file_path, metrics)
+    else:
+        batches = _iter_sales_frames(file_path, chunk_size, metrics)
+    return kind, batches if lazy else list(batches)
+
+def _parse_file_task(file_path):
+    """_parse_file for a worker process; also returns the worker's parse/clean stage metrics."""
+    metrics = RunMetrics()
+    kind, batches = _parse_file(file_path, metrics=metrics)
+    return kind, batches, metrics.stages
+
+def _parse_files_parallel(local_dir, files, workers, metrics=None):
+    """Yields (file, parsed) in file order from a process pool, products first, with a bounded number in flight.
+
+    The workers' stage metrics are merged into metrics; their times add up across workers.
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    ordered = sorted(files, key=lambda f: not is_product_file(f))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for file in ordered:
+            pending.append((file, executor.submit(_parse_file_task, os.path.join(local_dir, file))))
+            while pending and (len(pending) >= workers * 2 or file == ordered[-1]):
+                file_done, future = pending.popleft()
+                kind, batches, stages = future.result()
+                metrics.merge(stages)
+                yield file_done, (kind, batches)
+
+def _iter_sales_frames(file_path, chunk_size, metrics):
+    """Yields validated sales batches, timing reads as the parse stage and validation as the clean stage."""
+    for df_sales in metrics.timed_iter('parse', _read_sales_frames(file_path, chunk_size)):
+        metrics.record('parse', rows=len(df_sales))
+        with metrics.timed('clean'):
+            batch = validate_frame(df_sales, SALE_SCHEMA)
+        yield batch
+
+def _iter_product_batches(file_path, metrics=None):
+    """Yields validated products from a JSON file in PRODUCT_BATCH_SIZE batches, parsed incrementally."""
+    metrics = metrics if metrics is not None else RunMetrics()
+    with open_input(file_path) as f:
+        products = iter_json_array(f)
+        while True:
+            with metrics.timed('parse'):
+                raw_batch = list(itertools.islice(products, PRODUCT_BATCH_SIZE))
+            if not raw_batch:
+                return
+            metrics.record('parse', rows=len(raw_batch))
+            with metrics.timed('clean'):
+                batch = validate_frame(pd.DataFrame(raw_batch), PRODUCT_SCHEMA)
+            yield batch
+
+def _load_products(conn, cursor, product_batches, category_cache, product_category_cache, product_hash_cache=None,
+                   source_file=None, staging=False, metrics=None, changed_products=None):
+    """Writes product batches, registering any categories not seen before, and quarantines rejected products.
+
+    Only new products and products whose name or category changed are written (see _batch_process_products);
+    how many were written is recorded in metrics as the insert stage's products_written, and their ids are
+    added to changed_products if given.
+    Returns the number of valid products read and the number rejected.
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    product_hash_cache = product_hash_cache if product_hash_cache is not None else {}
+    valid_from = _snapshot_date(source_file)
+    # A snapshot older than one already loaded can't be diffed against the current products
+    late = _next_snapshot_date(cursor, valid_from) is not None
+    row_count = rejected_count = 0
+    for product_batch, rejected in product_batches:
+        rejected_count += _quarantine(cursor, rejected, 'product', source_file)
+        if not staging and not product_hash_cache:
+            cursor.execute("SELECT product_id, content_hash FROM products")
+            product_hash_cache.update(cursor.fetchall())
+        new_categories = set(product_batch['category'].unique()) - category_cache.keys()
+        written = _batch_process_products(conn, cursor, product_batch, category_cache, new_categories,
+                                          product_category_cache, product_hash_cache, staging=staging,
+                                          valid_from=valid_from, late=late, changed_products=changed_products)
+        if written is not None:
+            metrics.record('insert', products_written=written)
+        row_count += len(product_batch)
+    return row_count, rejected_count
+
+def _snapshot_date(source_file):
+    """The YYYY-MM-DD date in a file name (e.g. product_info_2025-06-01.json), else today's date."""
+    match = re.search(r"\d{4}-\d{2}-\d{2}", os.path.basename(source_file or ''))
+    return match.group() if match else datetime.date.today().isoformat()
+
+def _product_hashes(product_batch):
+    """Hashes each product's name and category to a signed 64-bit integer, which SQLite can store."""
+    hashes = pd.util.hash_pandas_object(product_batch[['product_name', 'category']], index=False)
+    return hashes.to_numpy().view(np.int64)
+
+def _load_sales(conn, cursor, sales_frames, product_category_cache, source_file=None, staging=False,
+                touched_dates=None, product_key_cache=None):
+    """Resolves categories for validated sales batches, inserts them in BATCH_SIZE batches and quarantines
+    rejected rows, including sales of unknown products.
+
+    With staging=True rows go to sales_staging and nothing is committed; see _merge_staging_tables.
+    The sale dates written are added to touched_dates if given.
+    With product_key_cache (compact schema) product ids and dates are written as product keys and day numbers.
+    Returns the number of sales written and the number rejected.
+    """
+    table = 'sales_staging' if staging else 'sales'
+    insert_columns = ', '.join(_sales_insert_columns(cursor))
+    row_count = rejected_count = 0
+
+    for df_sales, rejected in sales_frames:
+        # Get category_ids for all product_ids in the frame at once
+        _lookup_product_categories(cursor, df_sales['product_id'].unique(), product_category_cache)
+        sale_columns, unknown = _sales_columns(df_sales, product_category_cache)
+        rejected_count += _quarantine(cursor, rejected, 'sale', source_file)
+        rejected_count += _quarantine(cursor, unknown, 'sale', source_file)
+        sale_columns += ([source_file] * len(sale_columns[0]),)
+        if touched_dates is not None:
+            touched_dates.update(sale_columns[1])
+        if product_key_cache is not None:
+            sale_columns = _compact_sales_columns(cursor, sale_columns, product_key_cache)
+        del df_sales, rejected, unknown
+        
+        # Process in batches
+        total_rows = len(sale_columns[0])
+        row_count += total_rows
+        for i in range(0, total_rows, BATCH_SIZE):
+            if i % (BATCH_SIZE * 10) == 0:
+                logging.info(f"Processing sales batch {i}-{min(i+BATCH_SIZE, total_rows)} of {total_rows}")
+            
+            last_sale_id = None if staging else _max_sale_id(cursor)
+            cursor.executemany(
+                f"INSERT INTO {table} ({insert_columns}) VALUES (?, ?, ?, ?, ?, ?)",
+                zip(*(column[i:i+BATCH_SIZE] for column in sale_columns))
+            )
+            if not staging:
+                _update_rollups(cursor, "sale_id > ?", (last_sale_id,))
+                conn.commit()
+    return row_count, rejected_count
+
+def _quarantine(cursor, rejected, record_type, source_file):
+    """Writes rejected rows to rejected_rows with their reason and source file; returns how many."""
+    records = rejected_records(rejected)
+    if records:
+        rejected_at = datetime.datetime.now().isoformat(timespec='seconds')
+        cursor.executemany(
+            "INSERT INTO rejected_rows (source_file, record_type, reason, record, rejected_at) VALUES (?, ?, ?, ?, ?)",
+            ((source_file, record_type, reason, record, rejected_at) for reason, record in records)
+        )
+    return len(records)
+
+def _create_staging_tables(cursor):
+    """Creates the connection-local, unindexed tables bulk loads write into, sales_staging in the layout of sales."""
+    keys = "product_key INTEGER, sale_day INTEGER" if uses_compact_schema(cursor) else "product_id TEXT, sale_date TEXT"
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS sales_staging (
+            {keys},
+            quantity INTEGER,
+            price REAL,
+            category_id INTEGER,
+            source_file TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS products_staging (
+            product_id TEXT,
+            product_name TEXT,
+            category_id INTEGER,
+            content_hash INTEGER
+        )
+    """)
+
+def _merge_staging_tables(cursor, metrics=None, valid_from=None, changed_products=None):
+    """Moves staged rows into sales/products with set-based INSERT ... SELECT and empties the staging tables.
+
+    Staged products are merged by _merge_staged_products, with history versions valid from valid_from;
+    how many were written is recorded in metrics as the insert stage's products_written, and their ids are
+    added to changed_products if given.
+    """
+    metrics = metrics if metrics is not None else RunMetrics()
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM products_staging)")
+    if cursor.fetchone()[0]:
+        metrics.record('insert', products_written=_merge_staged_products(cursor, valid_from, changed_products))
+    last_sale_id = _max_sale_id(cursor)
+    columns = ', '.join(_sales_insert_columns(cursor))
+    cursor.execute(f"INSERT INTO sales ({columns}) SELECT {columns} FROM sales_staging ORDER BY rowid")
+    _update_rollups(cursor, "sale_id > ?", (last_sale_id,))
+    cursor.execute("DELETE FROM sales_staging")
+
+def _merge_staged_products(cursor, valid_from=None, changed_products=None):
+    """Upserts the new and changed products in products_staging, records their history and empties it.
+
+    Only the last staged occurrence of each product counts (as with row-by-row INSERT OR REPLACE), and only
+    if its content hash differs from the stored one. Each product written gets a product_history version
+    valid from valid_from (default today), closing its previous one. A snapshot older than one already loaded
+    (see _merge_late_products) only adds the products the table lacks and otherwise fills in product_history.
+    Returns the number of products written, adding the ids of those written to products to changed_products.
+    """
+    valid_from = valid_from or datetime.date.today().isoformat()
+    next_snapshot = _next_snapshot_date(cursor, valid_from)
+    if next_snapshot is not None:
+        return _merge_late_products(cursor, valid_from, next_snapshot, changed_products)
+    cursor.execute("DROP TABLE IF EXISTS temp.products_changed")
+    cursor.execute("""
+        CREATE TEMP TABLE products_changed AS
+        SELECT s.product_id, s.product_name, s.category_id, s.content_hash
+        FROM products_staging s LEFT JOIN products p ON p.product_id = s.product_id
+        WHERE s.rowid IN (SELECT MAX(rowid) FROM products_staging GROUP BY product_id)
+          AND p.content_hash IS NOT s.content_hash
+    """)
+    # An upsert updates changed products in place, keeping their rowid (INSERT OR REPLACE deletes and reinserts)
+    cursor.execute("""
+        INSERT INTO products (product_id, product_name, category_id, content_hash)
+        SELECT product_id, product_name, category_id, content_hash FROM products_changed WHERE true
+        ON CONFLICT (product_id) DO UPDATE SET
+            product_name = excluded.product_name,
+            category_id = excluded.category_id,
+            content_hash = excluded.content_hash
+    """)
+    cursor.execute("""
+        UPDATE product_history SET valid_to = ?
+        WHERE valid_to IS NULL AND product_id IN (SELECT product_id FROM products_changed)
+    """, (valid_from,))
+    cursor.execute("""
+        INSERT INTO product_history (product_id, product_name, category_id, valid_from)
+        SELECT product_id, product_name, category_id, ? FROM products_changed
+    """, (valid_from,))
+    written = cursor.rowcount
+    if changed_products is not None:
+        cursor.execute("SELECT product_id FROM products_changed")
+        changed_products.update(row[0] for row in cursor.fetchall())
+    cursor.execute("DROP TABLE temp.products_changed")
+    cursor.execute("DELETE FROM products_staging")
+    return written
+
+def _product_sale_dates(cursor, product_ids):
+    """The distinct sale dates of the sales of the given products (None for sales without a date)."""
+    if not product_ids:
+        return set()
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS changed_product_ids (product_id TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM changed_product_ids")
+    cursor.executemany("INSERT OR IGNORE INTO changed_product_ids VALUES (?)", ((p,) for p in product_ids))
+    if uses_compact_schema(cursor):
+        cursor.execute(f"""
+            SELECT DISTINCT {COMPACT_SALES_SQL['sale_date']} FROM sales WHERE product_key IN
+                (SELECT product_key FROM product_keys WHERE product_id IN (SELECT product_id FROM changed_product_ids))
+        """)
+    else:
+        cursor.execute("SELECT DISTINCT sale_date FROM sales "
+                       "WHERE product_id IN (SELECT product_id FROM changed_product_ids)")
+    sale_dates = {row[0] for row in cursor.fetchall()}
+    cursor.execute("DROP TABLE temp.changed_product_ids")
+    return sale_dates
+
+def _next_snapshot_date(cursor, snapshot_date):
+    """The date of the earliest product snapshot already loaded that is newer than snapshot_date, else None."""
+    cursor.execute("SELECT file_name FROM load_ledger WHERE status = 'loaded'")
+    later = [date for date in (_snapshot_date(file) for (file,) in cursor.fetchall() if is_product_file(file))
+             if date > snapshot_date]
+    return min(later, default=None)
+
+def _merge_late_products(cursor, valid_from, next_snapshot, changed_products=None):
+    """Fits the staged products of a snapshot loaded after a newer one (next_snapshot) into product_history.
+
+    products already reflects the newer snapshots, so existing products are left alone there; products it
+    does not hold yet are added, current from valid_from, as an in-order load would have. A product that
+    differs from the version in force on valid_from ends that version there and is valid until
+    next_snapshot, where the version it interrupted resumes (or until that product's next version, if that
+    starts sooner); a following version with the same content is started earlier instead. Returns the number
+    of versions written, adding the ids of products added to changed_products.
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.products_added")
+    cursor.execute("""
+        CREATE TEMP TABLE products_added AS
+        SELECT s.product_id, s.product_name, s.category_id, s.content_hash FROM products_staging s
+        WHERE s.rowid IN (SELECT MAX(rowid) FROM products_staging GROUP BY product_id)
+          AND s.product_id NOT IN (SELECT product_id FROM products)
+    """)
+    cursor.execute("""
+        INSERT INTO products (product_id, product_name, category_id, content_hash)
+        SELECT product_id, product_name, category_id, content_hash FROM products_added
+    """)
+    # Their history starts here; the backdating below then finds them in force and skips them
+    cursor.execute("""
+        INSERT INTO product_history (product_id, product_name, category_id, valid_from)
+        SELECT product_id, product_name, category_id, ? FROM products_added
+    """, (valid_from,))
+    written = cursor.rowcount
+    if changed_products is not None:
+        cursor.execute("SELECT product_id FROM products_added")
+        changed_products.update(row[0] for row in cursor.fetchall())
+    cursor.execute("DROP TABLE temp.products_added")
+    
+    cursor.execute("DROP TABLE IF EXISTS temp.products_backdated")
+    cursor.execute("""
+        CREATE TEMP TABLE products_backdated AS
+        SELECT s.product_id, s.product_name, s.category_id,
+               c.rowid AS covering_rowid, c.product_name AS covering_name, c.category_id AS covering_category,
+               c.valid_to AS covering_to,
+               MIN(?2, COALESCE((SELECT MIN(h.valid_from) FROM product_history h
+                                 WHERE h.product_id = s.product_id AND h.valid_from > ?1), ?2)) AS valid_to
+        FROM products_staging s
+        LEFT JOIN product_history c ON c.product_id = s.product_id AND c.valid_from <= ?1
+                                    AND (c.valid_to IS NULL OR c.valid_to > ?1)
+        WHERE s.rowid IN (SELECT MAX(rowid) FROM products_staging GROUP BY product_id)
+          AND (c.rowid IS NULL OR c.product_name IS NOT s.product_name OR c.category_id IS NOT s.category_id)
+    """, (valid_from, next_snapshot))
+    # Versions in force on valid_from end there; one that also spans next_snapshot resumes from it
+    cursor.execute("""
+        DELETE FROM product_history
+        WHERE rowid IN (SELECT covering_rowid FROM products_backdated) AND valid_from = ?
+    """, (valid_from,))
+    cursor.execute("""
+        UPDATE product_history SET valid_to = ?
+        WHERE rowid IN (SELECT covering_rowid FROM products_backdated)
+    """, (valid_from,))
+    cursor.execute("""
+        INSERT INTO product_history (product_id, product_name, category_id, valid_from, valid_to)
+        SELECT product_id, covering_name, covering_category, ?1, covering_to FROM products_backdated
+        WHERE covering_rowid IS NOT NULL AND (covering_to IS NULL OR covering_to > ?1)
+    """, (next_snapshot,))
+    cursor.execute("""
+        UPDATE product_history SET valid_from = ?
+        WHERE (product_id, valid_from, product_name, category_id) IN
+              (SELECT product_id, valid_to, product_name, category_id FROM products_backdated)
+    """, (valid_from,))
+    written += cursor.rowcount
+    cursor.execute("""
+        INSERT INTO product_history (product_id, product_name, category_id, valid_from, valid_to)
+        SELECT product_id, product_name, category_id, ?1, valid_to FROM products_backdated b
+        WHERE NOT EXISTS (SELECT 1 FROM product_history h WHERE h.product_id = b.product_id AND h.valid_from = ?1)
+    """, (valid_from,))
+    written += cursor.rowcount
+    cursor.execute("DROP TABLE temp.products_backdated")
+    cursor.execute("DELETE FROM products_staging")
+    return written
+
+def _read_sales_frames(file_path, chunk_size=None):
+    """Yields a sales CSV as one DataFrame, or as chunk_size-row DataFrames when chunk_size is set.
+
+    A compressed CSV is decompressed as it is read.
+    """
+    with open_input(file_path, 'rb') as f:
+        if chunk_size:
+            yield from pd.read_csv(f, chunksize=chunk_size)
+        else:
+            yield pd.read_csv(f)
+
+def _lookup_product_categories(cursor, product_ids, product_to_category):
+    """Adds the category_id of every product_id not already in product_to_category.
+
+    Products missing from the table are cached as None so repeated chunks don't query them again.
+    """
+    missing = [p for p in product_ids if p not in product_to_category]
+    
+    # Break into smaller chunks if there are many unique products
+    for i in range(0, len(missing), 500):
+        chunk = missing[i:i+500]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(f"SELECT product_id, category_id FROM products WHERE product_id IN ({placeholders})", chunk)
+        found = dict(cursor.fetchall())
+        product_to_category.update((product_id, found.get(product_id)) for product_id in chunk)
+
+def _lookup_product_keys(cursor, product_ids, product_key_cache):
+    """Adds the product_key of every product_id not already in product_key_cache, adding new ones to product_keys."""
+    missing = [p for p in product_ids if p not in product_key_cache]
+    cursor.executemany("INSERT OR IGNORE INTO product_keys (product_id) VALUES (?)", ((p,) for p in missing))
+    for i in range(0, len(missing), 500):
+        chunk = missing[i:i+500]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(f"SELECT product_id, product_key FROM product_keys WHERE product_id IN ({placeholders})", chunk)
+        product_key_cache.update(cursor.fetchall())
+
+def _compact_sales_columns(cursor, sale_columns, product_key_cache):
+    """Replaces the product_id and sale_date insert columns with product keys and day numbers."""
+    product_ids, sale_dates = sale_columns[:2]
+    _lookup_product_keys(cursor, set(product_ids), product_key_cache)
+    # Dates repeat heavily, so each distinct one is converted once
+    days = {date: None if date is None else (datetime.date.fromisoformat(date) - SALE_DAY_EPOCH).days
+            for date in set(sale_dates)}
+    return ([product_key_cache[p] for p in product_ids], [days[date] for date in sale_dates]) + sale_columns[2:]
+
+def _column_values(df, column, default):
+    """Returns a column as a list of Python values (None for missing), or default for every row if absent."""
+    if column not in df.columns:
+        return [default] * len(df)
+    values = df[column]
+    return values.astype(object).where(values.notna(), None).tolist()
+
+def _sales_columns(df_sales, product_to_category):
+    """Resolves category_id for the whole frame and returns the insert columns as lists.
+
+    Sales for products without a known category are returned separately as rejected rows, with a reason.
+    """
+    # Map through the frame's own products only; the shared cache can be far larger than the frame
+    lookup = {product_id: product_to_category.get(product_id) for product_id in df_sales['product_id'].unique()}
+    category_ids = df_sales['product_id'].map(lookup)
+    matched = category_ids.notna()
+    unknown = df_sales[~matched].assign(reason='unknown product_id')
+    df_sales = df_sales[matched]
+    return (
+        df_sales['product_id'].tolist(),
+        _column_values(df_sales, 'sale_date', None),
+        _column_values(df_sales, 'quantity', 0),
+        _column_values(df_sales, 'price', 0.0),
+        category_ids[matched].astype(int).tolist(),
+    ), unknown
+
+def _create_rollup_tables(cursor):
+    """Creates the rollup tables, computing them from sales if they are new to an existing database."""
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+    for create_table in ROLLUP_TABLES.values():
+        cursor.execute(create_table)
+    if not existing.issuperset(ROLLUP_TABLES):
+        rebuild_rollups(cursor)
+
+def _max_sale_id(cursor):
+    cursor.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales")
+    return cursor.fetchone()[0]
+
+def _update_rollups(cursor, where, params, sign=1):
+    """Adds (sign=1) or subtracts (sign=-1) the sales rows matching where to every rollup table.
+
+    where should select few rows through an index or the rowid, e.g. "sale_id > ?" after an insert.
+    Rollups are keyed on product_id and sale_date text with either sales layout.
+    """
+    sql = _sales_sql(cursor)
+    cursor.execute(f"""
+        INSERT INTO sales_daily_rollup (sale_date, sale_count)
+        SELECT COALESCE({sql['sale_date']}, ''), ? * COUNT(*) FROM sales WHERE {where} GROUP BY {sql['date_group']}
+        ON CONFLICT (sale_date) DO UPDATE SET sale_count = sale_count + excluded.sale_count
+    """, (sign, *params))
+    cursor.execute(f"""
+        INSERT INTO sales_product_daily_rollup (sale_date, product_id, sale_count)
+        SELECT COALESCE({sql['sale_date']}, ''), {sql['product_id']}, ? * COUNT(*) FROM sales WHERE {where}
+        GROUP BY {sql['date_group']}, {sql['product_group']}
+        ON CONFLICT (sale_date, product_id) DO UPDATE SET sale_count = sale_count + excluded.sale_count
+    """, (sign, *params))
+    cursor.execute(f"""
+        INSERT INTO sales_category_rollup (category_id, total_sales, sale_count)
+        SELECT category_id, ? * SUM(price * quantity), ? * COUNT(*) FROM sales WHERE {where} GROUP BY 1
+        ON CONFLICT (category_id) DO UPDATE SET
+            total_sales = total_sales + excluded.total_sales,
+            sale_count = sale_count + excluded.sale_count
+    """, (sign, sign, *params))
+    if sign < 0:
+        for table in ROLLUP_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE sale_count <= 0")
+
+def rebuild_rollups(cursor):
+    """Recomputes every rollup table from a full scan of sales."""
+    logging.info("Rebuilding sales rollup tables from the sales table...")
+    for table in ROLLUP_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    _update_rollups(cursor, "1=1", ())
+
+def verify_rollups(db_path):
+    """Checks each rollup table against a full recompute from sales and returns a list of mismatches."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    mismatches = []
+    sql = _sales_sql(cursor)
+    
+    # Counts are exact, so the two sides must match row for row
+    count_checks = {
+        'sales_daily_rollup': ("sale_date, sale_count",
+                               f"SELECT COALESCE({sql['sale_date']}, ''), COUNT(*) FROM sales GROUP BY 1"),
+        'sales_product_daily_rollup': ("sale_date, product_id, sale_count",
+                                       f"SELECT COALESCE({sql['sale_date']}, ''), {sql['product_id']}, COUNT(*) "
+                                       "FROM sales GROUP BY 1, 2"),
+    }
+    for table, (columns, recompute) in count_checks.items():
+        for label, query in (("missing or wrong in", f"{recompute} EXCEPT SELECT {columns} FROM {table}"),
+                             ("unexpected in", f"SELECT {columns} FROM {table} EXCEPT {recompute}")):
+            cursor.execute(query)
+            mismatches.extend(f"{label} {table}: {row}" for row in cursor.fetchall())
+    
+    # Totals are summed incrementally, so allow for floating point drift
+    cursor.execute("SELECT category_id, total_sales, sale_count FROM sales_category_rollup")
+    rollup = {category_id: (total, count) for category_id, total, count in cursor.fetchall()}
+    cursor.execute("SELECT category_id, SUM(price * quantity), COUNT(*) FROM sales GROUP BY category_id")
+    recomputed = {category_id: (total, count) for category_id, total, count in cursor.fetchall()}
+    for category_id in rollup.keys() | recomputed.keys():
+        expected, actual = recomputed.get(category_id, (0.0, 0)), rollup.get(category_id, (0.0, 0))
+        if expected[1] != actual[1] or not math.isclose(expected[0] or 0.0, actual[0] or 0.0, rel_tol=1e-9, abs_tol=1e-6):
+            mismatches.append(f"sales_category_rollup category_id={category_id}: expected {expected}, found {actual}")
+    
+    conn.close()
+    return mismatches
+
+def _batch_process_products(conn, cursor, product_batch, category_cache, new_categories, product_category_cache,
+                            product_hash_cache, staging=False, valid_from=None, late=False,
+                            changed_products=None):
+    """Helper function to process product batches and update category cache.
+
+    Only new products and products whose name or category changed are written, with a new product_history
+    version valid from valid_from: products whose content hash matches product_hash_cache (the stored
+    hashes, kept current here) are dropped before anything is written, unless the snapshot is late (older than
+    one already loaded); see also _merge_staged_products.
+    Returns the number of products written.
+    With staging=True products are left in products_staging and nothing is committed (returning None);
+    see _merge_staging_tables, which compares them with the table instead of product_hash_cache.
+    """
     # First insert any new categories
     if new_categories:
         category_values = [(category,) for category in new_categories]
         cursor.executemany("INSERT OR IGNORE INTO categories (category_name) VALUES (?)", category_values)
-        conn.commit()
+        if not staging:
+            conn.commit()
         
         # Update category cache with new IDs
         for category in new_categories:
@@ -221,16 +1021,45 @@ def _batch_process_products(conn, cursor, product_batch, category_cache, new_cat
                 cursor.execute("SELECT category_id FROM categories WHERE category_name = ?", (category,))
                 category_cache[category] = cursor.fetchone()[0]
     
-    # Now batch insert products
-    product_values = [
-        (p['product_id'], p['product_name'], category_cache[p['category']])
-        for p in product_batch
-    ]
-    
-    cursor.executemany(
-        "INSERT OR REPLACE INTO products (product_id, product_name, category_id) VALUES (?, ?, ?)",
-        product_values
+    if not staging:
+        # The last occurrence of a product wins, so only that one is compared with the stored hash
+        product_batch = product_batch.drop_duplicates('product_id', keep='last')
+    product_values = zip(
+        product_batch['product_id'].tolist(),
+        product_batch['product_name'].tolist(),
+        product_batch['category'].map(category_cache).tolist(),
+        _product_hashes(product_batch).tolist(),
     )
-    conn.commit()
+    if staging or late:
+        product_values = list(product_values)
+    else:
+        product_values = [row for row in product_values if product_hash_cache.get(row[0]) != row[3]]
+    
+    _create_staging_tables(cursor)
+    cursor.executemany("INSERT INTO products_staging (product_id, product_name, category_id, content_hash) "
+                       "VALUES (?, ?, ?, ?)", product_values)
+    written = None
+    if not staging:
+        written = _merge_staged_products(cursor, valid_from, changed_products)
+        conn.commit()
+    if late:
+        # A late snapshot only adds history, and products the table does not hold yet, which are the only
+        # cache entries it can change: unknown in product_category_cache, absent from product_hash_cache
+        for product_id, _, category_id, content_hash in product_values:
+            if product_category_cache.get(product_id, 0) is None:
+                product_category_cache[product_id] = category_id
+            if product_hash_cache and product_id not in product_hash_cache:
+                product_hash_cache[product_id] = content_hash
+        return written
+    if not staging:
+        product_hash_cache.update((row[0], row[3]) for row in product_values)
+    
+    # Keep cached sales lookups in step with the products just written
+    if product_category_cache:
+        for product_id, _, category_id, _ in product_values:
+            if product_id in product_category_cache:
+                product_category_cache[product_id] = category_id
+    return written
 
-__all__ = ['process_data']
\ No newline at end of file
+__all__ = ['process_data', 'verify_rollups', 'is_product_file', 'load_order', 'uses_compact_schema',
+           'COMPACT_SALES_SQL', 'SALE_DAY_EPOCH', 'SALE_DAY_PARAM']
\ No newline at end of file
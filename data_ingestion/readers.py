@@ -0,0 +1,122 @@
+import io
+import re
+import gzip
+import json
+import hashlib
+
+try:
+    import zstandard
+except ImportError:  # zstd-compressed inputs are optional
+    zstandard = None
+
+JSON_READ_SIZE = 64 * 1024  # Characters read per refill of the JSON buffer
+HASH_READ_SIZE = 1024 * 1024
+# Compressed inputs by suffix, decompressed while they are read
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DELIMITERS = ' \t\n\r,]'
+
+
+def file_checksum(path):
+    """Returns the sha256 hex digest of a local file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def split_compression(file):
+    """Returns (name without its compression suffix, compression) for a file name, compression None if plain."""
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if file.endswith(suffix):
+            return file[:-len(suffix)], compression
+    return file, None
+
+def can_decompress(file):
+    """Whether open_input can read file, i.e. it is plain or gzip, or zstd with zstandard installed."""
+    return split_compression(file)[1] != 'zstd' or zstandard is not None
+
+def open_input(path, mode='r'):
+    """Opens an input file for reading, decompressing .gz and .zst files on the fly.
+
+    mode is 'r' for text (UTF-8) or 'rb' for bytes. Only the compressed file is on disk; it is decompressed
+    a block at a time as the caller reads, so no uncompressed copy is ever written.
+    """
+    compression = split_compression(path)[1]
+    if compression == 'gzip':
+        return gzip.open(path, 'rt' if mode == 'r' else 'rb', encoding='utf-8' if mode == 'r' else None)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError(f"Reading {path} requires the zstandard package")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8') if mode == 'r' else stream
+    return open(path, mode, encoding='utf-8' if mode == 'r' else None)
+
+def iter_json_array(f, read_size=JSON_READ_SIZE):
+    """Yields the elements of a top-level JSON array from a text file one at a time.
+
+    Only the current read buffer and the element being decoded are held in memory,
+    so a catalog of millions of products never exists as one Python list.
+    """
+    buf, pos, eof = '', 0, False
+    started = need_separator = after_comma = False
+
+    while True:
+        # Skip whitespace, refilling the buffer as needed
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(read_size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON input")
+
+        char = buf[pos]
+        if not started:
+            if char != '[':
+                raise ValueError("Expected a JSON array")
+            started = True
+            pos += 1
+            continue
+        if char == ']':
+            if after_comma:
+                # json.load rejects [1,] too
+                raise ValueError("Trailing comma in JSON array")
+            # As with json.load, only whitespace may follow the array
+            pos += 1
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf):
+                    raise ValueError(f"Extra data after JSON array: {buf[pos:pos + 20]!r}")
+                buf, pos = f.read(read_size), 0
+                if not buf:
+                    return
+        if need_separator:
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+            need_separator, after_comma = False, True
+            pos += 1
+            continue
+
+        # Decode one element. One cut off by the buffer end either fails to decode or, for a
+        # bare number, decodes a prefix not followed by a delimiter, so read more and retry.
+        while True:
+            try:
+                item, end = _decoder.raw_decode(buf, pos)
+                if eof or (end < len(buf) and buf[end] in _DELIMITERS):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk = f.read(max(read_size, len(buf) - pos))
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        yield item
+        pos = end
+        need_separator, after_comma = True, False
+
+__all__ = ['iter_json_array', 'file_checksum', 'open_input', 'split_compression', 'can_decompress']
@@ -0,0 +1,147 @@
+"""Declarative schemas for product and sale records, validated a whole pandas batch at a time.
+
+Each field names a type and optional checks. A field is required (present, not null and not blank)
+unless it is marked nullable. Rows that fail any check are rejected with the name of the first
+failing field, instead of having the bad value coerced to a default.
+"""
+import numpy as np
+import pandas as pd
+
+PRODUCT_SCHEMA = {
+    'product_id': {'type': 'str'},
+    'product_name': {'type': 'str'},
+    'category': {'type': 'str'},
+}
+SALE_SCHEMA = {
+    'product_id': {'type': 'str'},
+    'sale_date': {'type': 'date', 'format': '%Y-%m-%d'},
+    'quantity': {'type': 'int', 'min': 0},
+    'price': {'type': 'float', 'min': 0},
+}
+NUMBER_TYPES = {int, float, np.int64, np.float64}  # Numbers a str field accepts as their text; bools are not
+
+
+def _distinct(column):
+    """Factorizes column into (codes, distinct values, missing).
+
+    Values repeat heavily within a file (dates, quantities, categories), so the checks run on the distinct
+    values only and are spread back over the rows through the codes (-1 for null). missing marks rows that
+    are null or a blank string.
+    """
+    codes, uniques = pd.factorize(column)
+    uniques = np.asarray(uniques, dtype=object)
+    blank = np.array([isinstance(v, str) and not v.strip() for v in uniques] + [True], dtype=bool)
+    return codes, uniques, blank[codes]
+
+def _spread(per_value, codes, null):
+    """Maps per-distinct-value results back to rows, with null for null rows (code -1 picks the last item)."""
+    return np.append(per_value, null)[codes]
+
+def _number_text(number):
+    """A number's text, with whole numbers written without a fraction (42.0 gives '42')."""
+    return str(int(number)) if number % 1 == 0 else str(number)
+
+def _check_str(column, spec):
+    # Each value is checked on its own, whatever the rest of its batch holds: text passes unless blank,
+    # a finite number passes as its text (as clean_data converted it), anything else is invalid
+    if pd.api.types.is_integer_dtype(column):
+        # e.g. a CSV column whose values all look like numbers
+        missing = column.isna().to_numpy()
+        return column.astype(str), ~missing, missing
+    if pd.api.types.is_float_dtype(column):
+        # e.g. numbers with blanks among them, which read_csv turns into floats
+        numbers = column.to_numpy(dtype=float, na_value=np.nan)
+        missing = np.isnan(numbers)
+        ok = np.isfinite(numbers)
+        values = np.full(len(numbers), None, dtype=object)
+        values[ok] = [_number_text(number) for number in numbers[ok]]
+        return pd.Series(values, index=column.index, dtype=object), ok, missing
+    if isinstance(column.dtype, pd.StringDtype) or pd.api.types.infer_dtype(column, skipna=True) == 'string':
+        # Every value is a string (or null) already, so only nulls and blanks fail and strip can run vectorized
+        stripped = column.astype(pd.StringDtype()).str.strip()
+        missing = column.isna().to_numpy() | (stripped == '').to_numpy(dtype=bool, na_value=True)
+        return column, ~missing, missing
+    # Mixed values, e.g. JSON names that are sometimes numbers: mostly distinct, so rather than factorizing,
+    # one pass classifies each value as text (0), something else (1), or null or blank (2); the few others
+    # are then split into numbers, kept as their text, and invalid values (3)
+    values = column.to_numpy(dtype=object)
+    state = np.fromiter(((0 if v.strip() else 2) if type(v) is str else 2 if v is None or v != v else 1
+                         for v in values), dtype=np.int8, count=len(values))
+    others = np.flatnonzero(state == 1)
+    if len(others):
+        values = values.copy()
+        for i in others:
+            if type(values[i]) in NUMBER_TYPES and abs(values[i]) != np.inf:
+                values[i] = _number_text(values[i])
+            else:
+                state[i] = 3
+        column = pd.Series(values, index=column.index, dtype=object)
+    return column, state <= 1, state == 2
+
+def _check_number(column, spec, integer):
+    if pd.api.types.is_numeric_dtype(column) and column.dtype != bool:
+        numbers = column.to_numpy(dtype=float, na_value=np.nan)
+        missing = np.isnan(numbers)
+    else:
+        codes, uniques, missing = _distinct(column)
+        numbers = _spread(pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=float),
+                          codes, np.nan)
+    ok = np.isfinite(numbers)
+    if integer:
+        ok &= numbers % 1 == 0
+    if 'min' in spec:
+        ok &= numbers >= spec['min']
+    values = np.where(ok, numbers, 0)
+    return values.astype(np.int64) if integer else values, ok, missing
+
+def _check_date(column, spec):
+    codes, uniques, missing = _distinct(column)
+    parsed = pd.to_datetime(pd.Index(uniques, dtype=object).astype(str), format=spec['format'], errors='coerce')
+    values = _spread(parsed.strftime(spec['format']).to_numpy(dtype=object), codes, None)
+    return values, pd.notna(values), missing
+
+CHECKS = {
+    'str': _check_str,
+    'int': lambda column, spec: _check_number(column, spec, integer=True),
+    'float': lambda column, spec: _check_number(column, spec, integer=False),
+    'date': _check_date,
+}
+
+def validate_frame(df, schema):
+    """Validates df against schema and converts the schema's columns to their types.
+
+    Returns (valid, rejected): valid holds the rows that passed, with only the schema's columns;
+    rejected holds the failing rows as they were read, plus a reason column such as 'invalid price'
+    or 'missing sale_date'.
+    """
+    reason = np.full(len(df), None, dtype=object)
+    converted = {}
+    for field, spec in schema.items():
+        if field not in df.columns:
+            converted[field] = np.full(len(df), None, dtype=object)
+            if not spec.get('nullable'):
+                reason[pd.isna(reason)] = f"missing {field}"
+            continue
+        values, ok, missing = CHECKS[spec['type']](df[field], spec)
+        if spec.get('nullable'):
+            ok = ok | missing
+            values = pd.Series(values, index=df.index).where(~missing, None)
+        failed = ~ok & pd.isna(reason)
+        if failed.any():
+            reason[failed] = np.where(missing[failed], f"missing {field}", f"invalid {field}")
+        converted[field] = values
+
+    valid = pd.DataFrame(converted, index=df.index)
+    rejected_mask = pd.notna(reason)
+    if not rejected_mask.any():
+        return valid, df.iloc[:0].assign(reason=reason[:0])
+    return valid[~rejected_mask], df[rejected_mask].assign(reason=reason[rejected_mask])
+
+def rejected_records(rejected):
+    """Returns the rejected rows as (reason, record as JSON) pairs."""
+    if rejected.empty:
+        return []
+    lines = rejected.drop(columns='reason').to_json(orient='records', lines=True).split('\n')
+    return list(zip(rejected['reason'].tolist(), lines))
+
+__all__ = ['PRODUCT_SCHEMA', 'SALE_SCHEMA', 'validate_frame', 'rejected_records']
@@ -1,16 +1,253 @@
+import os
+import time
+import queue
+import signal
+import cProfile
+import argparse
+import threading
+import traceback
+import sys
 
-from data_ingestion.ingest_to_bronze import ingest
-from data_ingestion.process_data_to_silver import process_data
+from data_ingestion.ingest_to_bronze import (
+    ingest, pending_files, mark_processed, stream_downloads, load_manifest, save_manifest, DOWNLOAD_WORKERS,
+)
+from data_ingestion.process_data_to_silver import (
+    process_data, verify_rollups, load_order, SALES_CHUNK_SIZE, BULK_MODES,
+)
+from data_ingestion.export_to_gold import write_gold, PARQUET_AVAILABLE
+from data_ingestion.metrics import RunMetrics
 
 DB_PATH = "database.db"
 LOCAL_DATA_DIR = "data"
+GOLD_DIR = "gold"
+RUN_REPORT_DIR = "run_reports"  # One JSON report per run, named by start time
+POLL_INTERVAL = 30.0  # Daemon: seconds between SFTP polls while new files keep arriving
+POLL_MAX_INTERVAL = 300.0  # Polls back off, doubling, up to this while nothing arrives or the server is down
+DAEMON_QUEUE_SIZE = 8  # Downloaded files waiting for the loader; downloads pause while it is full
+DAEMON_BATCH_FILES = 32  # Most queued files loaded together in one micro-batch
 
 
 
-def run_pipeline():
-    ingest(LOCAL_DATA_DIR)
-    process_data(LOCAL_DATA_DIR,DB_PATH)
+def run_pipeline(download_workers=1, chunk_size=None, workers=1, bulk=None, replace=False, gold=True,
+                 report_path=None, profile_path=None, compact=False):
+    """Runs ingest, process_data and the gold update, then writes the run's per-stage metrics report.
+
+    The report is written even when a stage fails, so slow or broken runs can be diagnosed from it.
+    With profile_path, the run is also profiled with cProfile and the stats dumped there.
+    """
+    metrics = RunMetrics()
+    report_path = report_path or os.path.join(RUN_REPORT_DIR, f"run-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    profiler = cProfile.Profile() if profile_path else None
+    if profiler:
+        profiler.enable()
+    try:
+        ingest(LOCAL_DATA_DIR, workers=download_workers, metrics=metrics)
+        # Only files the manifest has not seen loaded yet, so reruns do incremental work
+        new_files = pending_files(LOCAL_DATA_DIR)
+        summary = process_data(LOCAL_DATA_DIR, DB_PATH, files=new_files, chunk_size=chunk_size, workers=workers,
+                               bulk=bulk, replace=replace, metrics=metrics, compact=compact)
+        # Changed files process_data skipped stay pending, so a later --replace run reloads them
+        mark_processed(LOCAL_DATA_DIR, [f for f in new_files if f not in summary['changed_files']])
+        if gold:
+            with metrics.timed('gold'):
+                rows = update_gold(summary)
+            metrics.record('gold', rows=rows)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"Profile written to {profile_path}")
+        metrics.write_report(report_path)
+        print(f"Run report written to {report_path}")
+
+def update_gold(summary):
+    """Rewrites the Parquet partitions for the sale dates the load touched, including every date with sales of
+    a product whose name or category changed. Returns the number of rows written.
+    """
+    if not PARQUET_AVAILABLE:
+        print("pyarrow is not installed; skipping the Parquet gold layer")
+        return 0
+    if not summary['sale_dates'] and os.path.isdir(GOLD_DIR):
+        return 0
+    return write_gold(DB_PATH, GOLD_DIR, sale_dates=summary['sale_dates'])
+
+def run_daemon(download_workers=DOWNLOAD_WORKERS, chunk_size=None, workers=1, replace=False, gold=True,
+               poll_interval=POLL_INTERVAL, max_poll_interval=POLL_MAX_INTERVAL, queue_size=DAEMON_QUEUE_SIZE,
+               report_path=None, stop=None, compact=False):
+    """Runs the pipeline continuously, loading each file as soon as it is downloaded.
+
+    A download thread polls the SFTP directory, backing off while nothing new arrives or the server is
+    unreachable, and hands every finished download to this thread through a bounded queue, so files load
+    while others are still downloading. Files are queued in load order, product snapshots oldest first,
+    so loading the queue in micro-batches of up to DAEMON_BATCH_FILES files matches a one-shot run.
+    SIGINT/SIGTERM (or setting stop) ends polling: downloads in flight finish, everything queued is loaded,
+    and the daemon returns. Freshness lag, from a file's mtime on the SFTP server to its rows being
+    queryable, is printed per batch and kept in the run report, rewritten after every batch.
+    """
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+    metrics = RunMetrics()
+    report_path = report_path or os.path.join(RUN_REPORT_DIR, f"daemon-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    manifest = load_manifest(LOCAL_DATA_DIR)
+    manifest_lock = threading.Lock()
+    downloads = queue.Queue(maxsize=queue_size)
+    load_options = dict(chunk_size=chunk_size, workers=workers, replace=replace, gold=gold, compact=compact)
+
+    # Files an earlier run downloaded but never loaded go first
+    batch = sorted(file for file, entry in manifest.items() if not entry.get('processed'))
+    poller = threading.Thread(target=_poll_sftp, name='sftp-poller', daemon=True,
+                              args=(downloads, manifest, manifest_lock, stop, download_workers, poll_interval,
+                                    max_poll_interval, metrics))
+    poller.start()
+    print(f"Daemon polling SFTP every {poll_interval:g}s (up to {max_poll_interval:g}s when idle); Ctrl-C to stop")
+    finished = False
+    try:
+        while True:
+            if batch:
+                _load_batch(batch, manifest, manifest_lock, metrics, report_path, **load_options)
+            if finished:
+                break
+            batch, finished = _next_batch(downloads)
+    finally:
+        stop.set()
+        # Unblock a poller waiting on a full queue; whatever it queued is loaded by the next run
+        while poller.is_alive():
+            try:
+                downloads.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        metrics.write_report(report_path)
+        print(f"Daemon stopped; report written to {report_path}")
+
+def _next_batch(downloads):
+    """Waits for a download, then takes whatever else is queued, up to DAEMON_BATCH_FILES files.
+
+    Returns (files, finished); finished once the download thread has queued its closing None.
+    """
+    batch = []
+    file = downloads.get()
+    while file is not None:
+        batch.append(file)
+        if len(batch) >= DAEMON_BATCH_FILES:
+            return batch, False
+        try:
+            file = downloads.get_nowait()
+        except queue.Empty:
+            return batch, False
+    return batch, True
+
+def _poll_sftp(downloads, manifest, manifest_lock, stop, workers, poll_interval, max_poll_interval, metrics):
+    """run_daemon's download thread: queues each new or changed SFTP file once downloaded, then None when stopped."""
+    interval = poll_interval
+    try:
+        while not stop.is_set():
+            found = 0
+            with manifest_lock:
+                known = dict(manifest)
+            files = stream_downloads(LOCAL_DATA_DIR, known, workers, order=load_order)
+            try:
+                for file, entry in metrics.timed_iter('download', files):
+                    with manifest_lock:
+                        manifest[file] = entry
+                        save_manifest(LOCAL_DATA_DIR, manifest)
+                    metrics.record('download', files=1, bytes=entry['size'])
+                    downloads.put(file)  # Blocks while the loader is a full queue behind
+                    found += 1
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                print(f"SFTP poll failed: {e}")
+            finally:
+                files.close()
+            interval = poll_interval if found else min(interval * 2, max_poll_interval)
+            stop.wait(interval)
+    finally:
+        downloads.put(None)
+
+def _load_batch(batch, manifest, manifest_lock, metrics, report_path, chunk_size, workers, replace, gold, compact):
+    """Loads one daemon micro-batch, marks it processed and records its freshness lag.
+
+    Files skipped as changed since they were loaded are left unprocessed, for a later run with replace.
+    """
+    try:
+        summary = process_data(LOCAL_DATA_DIR, DB_PATH, files=batch, chunk_size=chunk_size, workers=workers,
+                               replace=replace, metrics=metrics, compact=compact)
+    except Exception:
+        # Left unprocessed in the manifest, so the next daemon start retries them
+        print(f"Loading {len(batch)} files failed:")
+        traceback.print_exc()
+        return
+    loaded_at = time.time()
+    batch = [file for file in batch if file not in summary['changed_files']]
+    if batch:
+        with manifest_lock:
+            for file in batch:
+                manifest[file]['processed'] = True
+            save_manifest(LOCAL_DATA_DIR, manifest)
+            lags = [loaded_at - manifest[file]['mtime'] for file in batch]
+        metrics.record('freshness', files=len(lags), lag_s=sum(lags))
+        metrics.record_max('freshness', lag_max_s=max(lags))
+        print(f"Loaded {len(batch)} files; freshness lag max {max(lags):.1f}s, mean {sum(lags) / len(lags):.1f}s")
+    if gold:
+        with metrics.timed('gold'):
+            rows = update_gold(summary)
+        metrics.record('gold', rows=rows)
+    metrics.write_report(report_path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ingest SFTP files and load them into the SQLite database.")
+    parser.add_argument('--download-workers', type=int, default=1,
+                        help="Parallel SFTP downloads over a pool of sessions (default: 1, sequential)")
+    parser.add_argument('--chunk-size', type=int, nargs='?', const=SALES_CHUNK_SIZE, default=None,
+                        help=f"Stream sales CSVs in chunks of this many rows (default when given: {SALES_CHUNK_SIZE})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes parsing and cleaning files in parallel; loading stays single-writer (default: 1)")
+    parser.add_argument('--bulk', choices=BULK_MODES, default=None,
+                        help="Backfill mode: staging tables, deferred indexes, one commit per file or per run")
+    parser.add_argument('--replace', action='store_true',
+                        help="Reload files that changed since they were loaded, replacing their previous rows")
+    parser.add_argument('--compact-schema', action='store_true',
+                        help="Create a new database with integer product keys and day numbers in sales")
+    parser.add_argument('--skip-gold', action='store_true',
+                        help=f"Do not update the date-partitioned Parquet copy of sales in {GOLD_DIR}/")
+    parser.add_argument('--report', default=None,
+                        help=f"Run report JSON path (default: {RUN_REPORT_DIR}/run-<timestamp>.json)")
+    parser.add_argument('--profile', default=None,
+                        help="Profile the run with cProfile and write the stats here (view with python -m pstats)")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep running: poll SFTP and load each file as soon as it is downloaded")
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help=f"Daemon: seconds between SFTP polls (default: {POLL_INTERVAL:g})")
+    parser.add_argument('--max-poll-interval', type=float, default=POLL_MAX_INTERVAL,
+                        help=f"Daemon: longest backoff between polls while idle (default: {POLL_MAX_INTERVAL:g})")
+    parser.add_argument('--queue-size', type=int, default=DAEMON_QUEUE_SIZE,
+                        help=f"Daemon: downloaded files queued for the loader (default: {DAEMON_QUEUE_SIZE})")
+    parser.add_argument('--verify-rollups', action='store_true',
+                        help="Check the rollup tables against a full recompute from sales instead of running the pipeline")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    run_pipeline()
-    
\ No newline at end of file
+    args = parse_args()
+    if args.verify_rollups:
+        mismatches = verify_rollups(DB_PATH)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} rollup mismatches")
+        sys.exit(1 if mismatches else 0)
+    if args.chunk_size and args.workers > 1:
+        # Worker processes hand back each file whole, so chunking would no longer keep memory flat
+        sys.exit("--chunk-size streams sales files in one process and cannot be combined with --workers")
+    if args.daemon:
+        if args.bulk:
+            # Bulk mode drops the sales indexes and rebuilds them per process_data call, i.e. per micro-batch
+            sys.exit("--bulk is for one-off backfills and cannot be combined with --daemon")
+        run_daemon(download_workers=args.download_workers, chunk_size=args.chunk_size, workers=args.workers,
+                   replace=args.replace, gold=not args.skip_gold, poll_interval=args.poll_interval,
+                   max_poll_interval=args.max_poll_interval, queue_size=args.queue_size, report_path=args.report,
+                   compact=args.compact_schema)
+        sys.exit(0)
+    run_pipeline(download_workers=args.download_workers, chunk_size=args.chunk_size, workers=args.workers, bulk=args.bulk,
+                 replace=args.replace, gold=not args.skip_gold, report_path=args.report, profile_path=args.profile,
+                 compact=args.compact_schema)
@@ -1,57 +1,185 @@
 # generate_data.py
+"""Generates product catalogs and daily sales files for the SFTP stand-in.
+
+Rows are generated with NumPy in chunks of GENERATE_CHUNK_ROWS and files are spread over a process pool,
+so millions of products and billions of sales rows can be produced with flat memory. --dirty mixes in
+malformed values to exercise the pipeline's cleaning. Run without arguments, it reproduces the original
+small data set (50 products, 200 days of 100 sales). A large-scale run looks like:
+
+    python sftp_setup/generate_test_data.py --days 365 --sales-per-file 1000000 --products 2000000 --workers 8
+"""
 import os
-import csv
-import json
-import random
+import argparse
 import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 
-DATA_DIR = "sftp_setup/fake_sftp_data"  
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pa_compute
+except ImportError:  # pandas' CSV writer is used instead, several times slower
+    pa = None
+
+DATA_DIR = "sftp_setup/fake_sftp_data"
 num_products =50
 num_days= 200
+SALES_PER_FILE = 100
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Home']
+GENERATE_CHUNK_ROWS = 1_000_000  # Rows generated and written at a time, bounding memory per worker
+
+# Malformed values of the kinds the pipeline's cleaning has to cope with
+DIRTY_SALE_VALUES = {
+    'product_id': ['', 'P', 'UNKNOWN'],
+    'sale_date': ['', 'not-a-date', '2025-13-45', '31/12/2025'],
+    'quantity': ['', 'ten', '-', '1.5.2'],
+    'price': ['', 'N/A', 'free', '$10'],
+}
+DIRTY_PRODUCT_VALUES = {
+    'product_name': [None, 123, ''],
+    'category': [None, 7, ''],
+}
+
+
+def _arrow_product_ids(numbers):
+    digits = pa_compute.utf8_lpad(pa.array(numbers).cast(pa.string()), width=3, padding='0')
+    return pa_compute.binary_join_element_wise('P', digits, '')
+
+def product_ids(numbers):
+    """Formats product numbers the way the catalog does (P001, P002, ...)."""
+    if pa is None:
+        return pd.Series(numbers).map("P{:03}".format).to_numpy()
+    return _arrow_product_ids(numbers).to_numpy(zero_copy_only=False)
 
-def generate_sales_data(date, num_records=100):
-    filename = f"sales_data_{date.strftime('%Y-%m-%d')}.csv"
-    filepath = os.path.join(DATA_DIR, filename)
-
-    product_ids = [f"P{i:03}" for i in range(1, num_products)]  # 20 product IDs
-    with open(filepath, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['product_id', 'sale_date', 'quantity', 'price'])
-        for _ in range(num_records):
-            product_id = random.choice(product_ids)
-            sale_date = date.strftime('%Y-%m-%d')
-            quantity = random.randint(1, 10)
-            price = round(random.uniform(10, 100), 2)
-            writer.writerow([product_id, sale_date, quantity, price])
-    print(f"Generated: {filename}")
-
-def generate_product_info(date, num_products):
+def _dirty(rng, column, values, fraction, as_text=False):
+    """Replaces about fraction of column with random values from values, as strings if as_text."""
+    if not fraction:
+        return column
+    column = column.astype(str).astype(object) if as_text else column.astype(object)
+    mask = rng.random(len(column)) < fraction
+    column[mask] = np.array(values, dtype=object)[rng.integers(0, len(values), mask.sum())]
+    return column
+
+def _dirty_text(rng, column, values, fraction):
+    """Arrow version of _dirty for CSV output: the column as text with about fraction of it replaced."""
+    text = (column if isinstance(column, pa.Array) else pa.array(column)).cast(pa.string())
+    if not fraction:
+        return text
+    mask = rng.random(len(column)) < fraction
+    replacements = np.array(values)[rng.integers(0, len(values), len(column))]
+    return pa_compute.if_else(mask, pa.array(replacements), text)
+
+def generate_sales_data(date, num_records=SALES_PER_FILE, num_products=num_products, part=None, dirty=0.0,
+                        seed=None, data_dir=DATA_DIR):
+    """Writes one day's sales file, num_records rows long, GENERATE_CHUNK_ROWS rows at a time."""
+    suffix = "" if part is None else f"_{part:03}"
+    filename = f"sales_data_{date.strftime('%Y-%m-%d')}{suffix}.csv"
+    filepath = os.path.join(data_dir, filename)
+    rng = np.random.default_rng(seed)
+    numbers = np.arange(1, num_products + 1)
+    # Kept as Arrow arrays when possible, so rows are picked and written without Python string objects
+    ids = product_ids(numbers) if pa is None else _arrow_product_ids(numbers)
+    sale_date = date.strftime('%Y-%m-%d')
+
+    writer = None
+    with open(filepath, 'wb') as csvfile:
+        for start in range(0, max(num_records, 1), GENERATE_CHUNK_ROWS):
+            rows = min(GENERATE_CHUNK_ROWS, num_records - start)
+            picks = rng.integers(0, num_products, rows)
+            chunk = {
+                'product_id': ids[picks] if pa is None else ids.take(picks),
+                'sale_date': np.full(rows, sale_date, dtype=object) if pa is None else
+                             pa.array([sale_date]).take(np.zeros(rows, dtype=np.int64)),
+                'quantity': rng.integers(1, 11, rows),
+                'price': rng.uniform(10, 100, rows).round(2),
+            }
+            fraction = dirty / len(DIRTY_SALE_VALUES)
+            if pa is None:
+                for column, values in DIRTY_SALE_VALUES.items():
+                    chunk[column] = _dirty(rng, chunk[column], values, fraction, as_text=True)
+                csvfile.write(pd.DataFrame(chunk).to_csv(header=start == 0, index=False).encode())
+                continue
+            if dirty:
+                chunk = {column: _dirty_text(rng, chunk[column], values, fraction)
+                         for column, values in DIRTY_SALE_VALUES.items()}
+            table = pa.table(chunk)
+            if writer is None:
+                # No value contains a delimiter or quote, so nothing needs quoting
+                options = pa_csv.WriteOptions(quoting_style='none', quoting_header='none')
+                writer = pa_csv.CSVWriter(csvfile, table.schema, write_options=options)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    return filename
+
+def generate_product_info(date, num_products, dirty=0.0, seed=None, data_dir=DATA_DIR):
+    """Writes one product catalog snapshot as a JSON array, GENERATE_CHUNK_ROWS products at a time."""
     filename = f"product_info_{date.strftime('%Y-%m-%d')}.json"
-    filepath = os.path.join(DATA_DIR, filename)
-
-    products = []
-    for i in range(1, num_products + 1):
-        product_id = f"P{i:03}"
-        product_name = f"Product {i}"
-        category = random.choice(['Electronics', 'Clothing', 'Books', 'Home'])
-        products.append({
-            'product_id': product_id,
-            'product_name': product_name,
-            'category': category
-        })
+    filepath = os.path.join(data_dir, filename)
+    rng = np.random.default_rng(seed)
 
     with open(filepath, 'w') as jsonfile:
-        json.dump(products, jsonfile, indent=4)
-    print(f"Generated: {filename}")
+        jsonfile.write('[')
+        for start in range(0, num_products, GENERATE_CHUNK_ROWS):
+            numbers = np.arange(start + 1, min(start + GENERATE_CHUNK_ROWS, num_products) + 1)
+            chunk = pd.DataFrame({
+                'product_id': product_ids(numbers),
+                'product_name': pd.Series(numbers).map("Product {}".format).to_numpy(),
+                'category': np.array(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), len(numbers))],
+            })
+            for column, values in DIRTY_PRODUCT_VALUES.items():
+                chunk[column] = _dirty(rng, chunk[column].to_numpy(), values, dirty / len(DIRTY_PRODUCT_VALUES))
+            if start:
+                jsonfile.write(',')
+            jsonfile.write(chunk.to_json(orient='records')[1:-1])
+        jsonfile.write(']')
+    return filename
 
-def generate_data_files(num_days):
-    """Generates data files for multiple days."""
-    os.makedirs(DATA_DIR, exist_ok=True)
+def generate_data_files(num_days, num_products=num_products, sales_per_file=SALES_PER_FILE, files_per_day=1,
+                        product_days=None, dirty=0.0, workers=1, seed=0, data_dir=DATA_DIR):
+    """Generates data files for multiple days, ending today.
+
+    Each day gets files_per_day sales files and, for the most recent product_days days (all by default),
+    a full product catalog snapshot. Files are generated in a pool of workers processes.
+    """
+    os.makedirs(data_dir, exist_ok=True)
     today = datetime.date.today()
+    product_days = num_days if product_days is None else product_days
+    # One seed per file, so output is reproducible whatever the number of workers
+    seeds = np.random.SeedSequence(seed).spawn(num_days * (files_per_day + 1))
+    jobs = []
     for i in range(num_days):
         current_date = today - datetime.timedelta(days=i)
-        generate_sales_data(current_date)
-        generate_product_info(current_date, num_products)
+        for part in range(files_per_day):
+            jobs.append((generate_sales_data, current_date, sales_per_file, num_products,
+                         part if files_per_day > 1 else None, dirty, seeds.pop(), data_dir))
+        product_seed = seeds.pop()
+        if i < product_days:
+            jobs.append((generate_product_info, current_date, num_products, dirty, product_seed, data_dir))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(*job) for job in jobs]
+        for future in futures:
+            print(f"Generated: {future.result()}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate product and sales files for the SFTP stand-in.")
+    parser.add_argument('--days', type=int, default=num_days)
+    parser.add_argument('--products', type=int, default=num_products)
+    parser.add_argument('--sales-per-file', type=int, default=SALES_PER_FILE)
+    parser.add_argument('--files-per-day', type=int, default=1, help="Sales files per day")
+    parser.add_argument('--product-days', type=int, default=None,
+                        help="Days (most recent first) that get a product catalog snapshot (default: every day)")
+    parser.add_argument('--dirty', type=float, default=0.0,
+                        help="Fraction of rows with a malformed value, e.g. 0.01 (default: 0)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Generator processes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=DATA_DIR)
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    generate_data_files(num_days)
\ No newline at end of file
+    args = parse_args()
+    generate_data_files(args.days, num_products=args.products, sales_per_file=args.sales_per_file,
+                        files_per_day=args.files_per_day, product_days=args.product_days, dirty=args.dirty,
+                        workers=args.workers, seed=args.seed, data_dir=args.output_dir)
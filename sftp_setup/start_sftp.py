@@ -13,6 +13,12 @@ import threading
 HOST, PORT = 'localhost', 22
 BACKLOG = 10
 KEY = os.path.abspath(os.path.join(os.path.dirname(__file__),  "test_rsa.key"))
+LATENCY = 0.0  # Seconds added to every file open, to mimic a remote link when benchmarking
+
+class LatencySFTPServer(StubSFTPServer):
+    def open(self, path, flags, attr):
+        time.sleep(LATENCY)
+        return super().open(path, flags, attr)
 
 class ConnHandlerThd(threading.Thread):
     def __init__(self, conn, keyfile):
@@ -25,7 +31,7 @@ class ConnHandlerThd(threading.Thread):
         transport = paramiko.Transport(self._conn)
         transport.add_server_key(host_key)
         transport.set_subsystem_handler(
-            'sftp', paramiko.SFTPServer, StubSFTPServer)
+            'sftp', paramiko.SFTPServer, LatencySFTPServer if LATENCY else StubSFTPServer)
 
         server = StubServer()
         transport.start_server(server=server)
@@ -35,7 +41,9 @@ class ConnHandlerThd(threading.Thread):
             time.sleep(1)
 
 
-def start_server(host, port, keyfile, level):
+def start_server(host, port, keyfile, level, latency=0.0):
+    global LATENCY
+    LATENCY = latency
     paramiko_level = getattr(paramiko.common, level)
     paramiko.common.logging.basicConfig(level=paramiko_level)
 
@@ -73,6 +81,10 @@ def main():
         '-k', '--keyfile', dest='keyfile', metavar='FILE',
         help='Path to private key, for example /tmp/test_rsa.key'
         )
+    parser.add_option(
+        '--latency-ms', dest='latency_ms', type='float', default=0,
+        help='Simulated round-trip latency per file open in ms [default: %default]'
+        )
 
     options, args = parser.parse_args()
     options.keyfile = KEY
@@ -81,7 +93,7 @@ def main():
         parser.print_help()
         sys.exit(-1)
 
-    start_server(options.host, options.port, options.keyfile, options.level)
+    start_server(options.host, options.port, options.keyfile, options.level, options.latency_ms / 1000.0)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file